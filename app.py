@@ -1,9 +1,38 @@
 import streamlit as st
 from pathlib import Path
-import shutil
-import pandas as pd
-from edgar_downloader import get_filing_types, download_edgar_filings, download_and_extract_mda
-from mda_analyzer_gemini import analyze_mda_with_gemini, load_gemini_api_key
+import time
+from job_queue import enqueue_job, ensure_worker, get_job
+from mda_search import search_mda
+
+# Heavier modules are imported inside the cached functions below, on first use
+
+def _mtime(path):
+    """Modification time used as a cache key, so cached values follow the file or directory"""
+    try:
+        return Path(path).stat().st_mtime_ns
+    except OSError:
+        return None
+
+@st.cache_data
+def filing_type_options():
+    from edgar_downloader import get_filing_types
+    return get_filing_types()
+
+@st.cache_data
+def gemini_api_key_configured(key_mtime):
+    from mda_analyzer_gemini import load_gemini_api_key
+    return bool(load_gemini_api_key())
+
+@st.cache_data
+def available_mda_files(identifier, filing_type, dir_mtime):
+    from mda_analyzer_gemini import get_available_mda_files
+    return sorted(str(f) for f in get_available_mda_files(identifier, filing_type))
+
+@st.cache_data(max_entries=2)
+def read_export(zip_path):
+    # Export names carry a hash of their contents, so the path alone is a safe key
+    with open(zip_path, "rb") as f:
+        return f.read()
 
 st.set_page_config(page_title="EDGAR Filings Downloader", layout="centered")
 st.title("📄 SEC EDGAR Filings Downloader")
@@ -23,69 +52,95 @@ if 'analysis_result' not in st.session_state:
 st.markdown("Enter a **company ticker** (e.g., `AAPL`) or a **CIK number** (e.g., `320193`).")
 
 user_input = st.text_input("Ticker or CIK").strip()
-filing_type = st.selectbox("Select Filing Type", get_filing_types())
+filing_type = st.selectbox("Select Filing Type", filing_type_options())
 years_back = st.slider("Years Back", 1, 20, 5)
+incremental = st.checkbox("Only fetch filings not already downloaded", value=False)
+include_full_submission = st.checkbox(
+    "Also download full submissions (exhibits included)", value=False,
+    help="By default only each filing's primary document is downloaded, which is all the MD&A analysis needs."
+)
+analysis_mode = st.radio(
+    "Analysis mode",
+    ["Combined report", "Per-filing with year-over-year trend"],
+    help="Per-filing mode analyzes each filing once and reuses stored analyses, so a new year only costs one new analysis."
+)
 
 if st.button("📥 Download & Analyze Filings"):
     if not user_input:
         st.warning("⚠️ Please enter a ticker or CIK.")
     else:
-        ticker, cik = (None, user_input) if user_input.isdigit() else (user_input.upper(), None)
-        identifier = ticker if ticker else cik
-
-        with st.spinner("Downloading filings and extracting MD&A sections..."):
-            success, count, mda_count = download_and_extract_mda(
-                ticker=ticker,
-                cik=cik,
-                filing_type=filing_type,
-                years_back=years_back
+        identifier = user_input if user_input.isdigit() else user_input.upper()
+        if not gemini_api_key_configured(_mtime("gemini_api_key.txt")):
+            st.warning("⚠️ Gemini API key not found: filings will be downloaded and extracted but not analyzed.")
+
+        # The work runs in the background worker; the job id in the URL survives reloads
+        job_id = enqueue_job("download_and_analyze", {
+            "identifier": identifier,
+            "filing_type": filing_type,
+            "years_back": years_back,
+            "incremental": incremental,
+            "include_full_submission": include_full_submission,
+            "analysis_mode": "per_filing" if analysis_mode == "Per-filing with year-over-year trend" else "combined",
+        })
+        ensure_worker()
+        st.query_params["job"] = job_id
+        st.session_state.analysis_result = None
+
+STAGE_LABELS = {
+    "download": "Downloading filings",
+    "extract": "Extracting MD&A sections",
+    "export": "Building ZIP archive",
+    "analyze": "Analyzing MD&A sections",
+}
+
+job_id = st.query_params.get("job")
+job = get_job(job_id) if job_id else None
+
+if job and job["status"] in ("queued", "running"):
+    progress = job["progress"] or {}
+    # A fresh worker requeues jobs left running by a dead one, so a crash mid-job does not poll forever
+    ensure_worker()
+    if job["status"] == "queued":
+        st.info("⏳ Waiting for the background worker...")
+    else:
+        label = STAGE_LABELS.get(job["stage"], "Working")
+        if progress.get("total"):
+            detail = f" ({progress['done']}/{progress['total']})" + (f" - {progress['file']}" if progress.get("file") else "")
+            st.progress(progress["done"] / progress["total"], text=label + detail)
+        else:
+            st.info(f"⏳ {label}...")
+    time.sleep(1)
+    st.rerun()
+elif job and job["status"] == "failed":
+    st.error(f"❌ Job failed: {job['error']}")
+elif job and job["status"] == "done":
+    result = job["result"]
+    params = job["params"]
+    if result["success"] and (result["count"] > 0 or result["mda_count"] > 0):
+        st.success(f"✅ Downloaded {result['count']} filings and extracted {result['mda_count']} MD&A sections.")
+
+        mda_dir = Path("edgar_data") / "mda_sections" / params["identifier"] / params["filing_type"]
+        st.session_state.downloaded_files = [
+            Path(f) for f in available_mda_files(params["identifier"], params["filing_type"], _mtime(mda_dir))
+        ]
+        st.session_state.mda_dir = mda_dir
+        st.session_state.identifier = params["identifier"]
+        st.session_state.filing_type = params["filing_type"]
+        st.session_state.analysis_result = result["analysis"]
+
+        if result["analysis"] and result["analysis"].startswith("❌"):
+            st.error(result["analysis"])
+            st.session_state.analysis_result = None
+
+        if result["zip_path"] and Path(result["zip_path"]).exists():
+            st.download_button(
+                label="📦 Download ZIP",
+                data=read_export(result["zip_path"]),
+                file_name=f"{params['identifier']}_{params['filing_type']}_filings.zip",
+                mime="application/zip"
             )
-            if success and count > 0:
-                st.success(f"✅ Downloaded {count} filings and extracted {mda_count} MD&A sections.")
-                
-                # Store information about the download
-                data_dir = Path("edgar_data")
-                mda_dir = data_dir / "mda_sections" / identifier / filing_type
-                
-                # Save the list of downloaded files
-                if mda_dir.exists():
-                    st.session_state.downloaded_files = list(mda_dir.glob("*.txt"))
-                    st.session_state.mda_dir = mda_dir
-                    st.session_state.identifier = identifier
-                    st.session_state.filing_type = filing_type
-                
-                # Create a ZIP file containing both original filings and extracted MD&A
-                zip_path = shutil.make_archive("edgar_filings", 'zip', data_dir)
-
-                # Automatically analyze all files with a comprehensive analysis
-                with st.spinner("Analyzing MD&A sections..."):
-                    # Read all files
-                    combined_text = ""
-                    for file_path in st.session_state.downloaded_files:
-                        try:
-                            with open(file_path, "r", encoding="utf-8") as f:
-                                combined_text += f"\n\n--- FROM FILE: {file_path.name} ---\n\n"
-                                combined_text += f.read()
-                        except Exception as e:
-                            st.warning(f"Error reading {file_path.name}: {str(e)}")
-                    
-                    # Check if Gemini API key is available
-                    api_key = load_gemini_api_key()
-                    if not api_key:
-                        st.error("❌ Gemini API key not found. Please create a 'gemini_api_key.txt' file in your app folder.")
-                    else:
-                        # Perform comprehensive analysis
-                        analysis_result = analyze_mda_with_gemini(combined_text, "comprehensive")
-                        st.session_state.analysis_result = analysis_result
-                
-                st.download_button(
-                    label="📦 Download ZIP",
-                    data=open(zip_path, "rb"),
-                    file_name="edgar_filings.zip",
-                    mime="application/zip"
-                )
-            else:
-                st.error("❌ Failed to download filings. Please check your input.")
+    else:
+        st.error("❌ Failed to download filings. Please check your input.")
 
 # Display analysis results if available
 if st.session_state.analysis_result:
@@ -100,4 +155,24 @@ if st.session_state.analysis_result:
             data=st.session_state.analysis_result,
             file_name=f"{st.session_state.identifier}_{st.session_state.filing_type}_comprehensive_analysis.md",
             mime="text/markdown"
-        )
\ No newline at end of file
+        )
+
+# Full-text search over every MD&A section extracted so far
+with st.expander("🔎 Search MD&A sections"):
+    query = st.text_input("Search terms", help='Supports "exact phrases", AND / OR / NOT and prefix*')
+    col1, col2, col3 = st.columns(3)
+    search_company = col1.text_input("Company").strip().upper()
+    search_form = col2.text_input("Form").strip()
+    search_year = col3.text_input("Fiscal year").strip()
+    if query:
+        try:
+            hits = search_mda(query, company=search_company or None, form=search_form or None,
+                              fiscal_year=search_year or None)
+        except ValueError as e:
+            st.error(f"❌ {str(e)}")
+            hits = []
+        if not hits:
+            st.info("No matching MD&A sections.")
+        for hit in hits:
+            st.markdown(f"**{hit['company']} {hit['form']} FY{hit['fiscal_year']}** — `{Path(hit['path']).name}`")
+            st.caption(hit["snippet"])
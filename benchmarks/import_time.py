@@ -0,0 +1,82 @@
+"""
+Import-time budget for the app's cold start and the modules workers load.
+
+    python benchmarks/import_time.py                 # check every module against its budget
+    python benchmarks/import_time.py --repeat 7 --json import_times.jsonl
+
+Each module is imported in a fresh interpreter (best of --repeat, minus the time of
+an empty interpreter), so nothing is shared between measurements. The exit status
+is 1 if any module is over budget.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# Seconds on top of the bare interpreter. "app startup" is what app.py imports before the first render.
+BUDGETS = {
+    "app startup": ("import streamlit, job_queue, mda_search", 1.0),
+    "edgar_downloader": ("import edgar_downloader", 0.3),
+    "mda_analyzer_gemini": ("import mda_analyzer_gemini", 0.3),
+    "sec_xbrl_processor": ("import sec_xbrl_processor", 1.5),
+    "job_queue": ("import job_queue", 0.1),
+    "mda_search": ("import mda_search", 0.1),
+    "filing_export": ("import filing_export", 0.1),
+    "metrics": ("import metrics", 0.05),
+}
+
+def time_import(statement: str, repeat: int) -> float:
+    """Best wall time of running statement in a fresh interpreter"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=REPO_ROOT, check=True)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", help="Comma-separated names to measure")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module (the best one is reported)")
+    parser.add_argument("--json", help="Append one JSON line per result to this file")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BUDGETS)
+    unknown = [name for name in names if name not in BUDGETS]
+    if unknown:
+        parser.error(f"Unknown modules: {', '.join(unknown)}")
+
+    baseline = time_import("pass", args.repeat)
+    print(f"bare interpreter: {baseline:.3f}s\n")
+    print(f"{'module':<22}{'seconds':>10}{'budget':>10}  result")
+    failures = 0
+    results = []
+    for name in names:
+        statement, budget = BUDGETS[name]
+        try:
+            seconds = max(time_import(statement, args.repeat) - baseline, 0.0)
+        except subprocess.CalledProcessError:
+            seconds = None
+        ok = seconds is not None and seconds <= budget
+        failures += not ok
+        results.append({"module": name, "seconds": seconds, "budget": budget, "ok": ok,
+                        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")})
+        seconds_text = f"{seconds:10.3f}" if seconds is not None else f"{'-':>10}"
+        result = "ok" if ok else ("FAIL: import error" if seconds is None else "FAIL: over budget")
+        print(f"{name:<22}{seconds_text}{budget:10.2f}  {result}")
+
+    if args.json:
+        with open(args.json, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
+    print(f"\n{len(results) - failures}/{len(results)} within budget")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""
+Offline benchmarks for the parsing hot paths, on synthetic filings.
+
+    python benchmarks/run_benchmarks.py                      # 100K, 1M and 10M filings
+    python benchmarks/run_benchmarks.py --sizes 100K,50M --xbrl-facts 50000
+    python benchmarks/run_benchmarks.py --update-golden      # after an intended output change
+
+Every run reports time, throughput and peak traced memory per benchmark and case,
+checks the output against the generator's ground truth, and compares a digest
+of the output with benchmarks/golden_outputs.json. The golden digests were
+recorded from the current extractors, so Item 7 output is also compared with
+the original BeautifulSoup extractor (extract_item_7_from_html_bs4). The exit status is 1 if any
+check fails, so a nightly job can gate on it.
+"""
+import argparse
+import hashlib
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bs4 import BeautifulSoup
+
+from edgar_downloader import (extract_fiscal_year_from_content, extract_item_7_from_html,
+                              extract_item_7_from_html_bs4, resolve_fiscal_year)
+from extract_financials import clean_table, extract_statement_tables
+from html_stream import clean_text
+from sec_xbrl_processor import get_balance_sheet, get_cash_flow_statement, get_income_statement
+from synthetic_filings import (STATEMENT_ROWS, generate_filing, generate_submission_header,
+                               generate_xbrl_instance)
+from xbrl_instance_parser import parse_xbrl_instance
+
+GOLDEN_PATH = Path(__file__).resolve().parent / "golden_outputs.json"
+DEFAULT_SIZES = "100K,1M,10M"
+DEFAULT_XBRL_FACTS = "2000,20000"
+UNITS = {"K": 1024, "M": 1024 ** 2}
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper()
+    if text[-1] in UNITS:
+        return int(float(text[:-1]) * UNITS[text[-1]])
+    return int(text)
+
+def digest(value) -> str:
+    """Stable hash of a benchmark output (text, DataFrame, list or dict of those)"""
+    if hasattr(value, "to_csv"):
+        value = value.to_csv()
+    elif isinstance(value, (list, tuple)):
+        value = "\n\x00".join(digest(v) for v in value)
+    elif isinstance(value, dict):
+        value = "\n\x00".join(f"{k}={digest(v)}" for k, v in sorted(value.items()))
+    return hashlib.sha256(str(value).encode("utf-8")).hexdigest()
+
+# Each benchmark: setup(case) -> input, run(input) -> output, check(output, case) -> list of problems,
+# plus how to count bytes and items of one case.
+
+def reference_item_7(case) -> str:
+    """Normalized Item 7 text from the BeautifulSoup extractor, computed once per case"""
+    if "reference_item_7" not in case:
+        case["reference_item_7"] = clean_text(extract_item_7_from_html_bs4(case["html"]))
+    return case["reference_item_7"]
+
+def check_item_7(text, case):
+    truth = case["truth"]
+    problems = []
+    if clean_text(text) != reference_item_7(case):
+        problems.append("differs from the BeautifulSoup reference extractor")
+    if truth["mda_begin"] not in text:
+        problems.append("MD&A start missing")
+    if truth["mda_end"] not in text:
+        problems.append("MD&A end missing")
+    if truth["not_mda"] in text:
+        problems.append("text outside Item 7 included")
+    return problems
+
+def check_clean_text(text, case):
+    problems = check_item_7(text, case)
+    if "  " in text or "\n" in text:
+        problems.append("whitespace not normalized")
+    return problems
+
+def check_fiscal_year(year, case):
+    expected = case["truth"]["fiscal_year"]
+    return [] if year == expected else [f"fiscal year {year}, expected {expected}"]
+
+def run_statement_tables(html):
+    tables = extract_statement_tables(BeautifulSoup(html, "html.parser"))
+    return {statement_type: [clean_table(df) for df in dfs] for statement_type, dfs in tables.items()}
+
+def check_statement_tables(tables, case):
+    problems = []
+    for statement_type, rows in STATEMENT_ROWS.items():
+        found = any(
+            set(rows) <= set(df.iloc[:, 0].astype(str)) for df in tables.get(statement_type, []) if len(df.columns)
+        )
+        if not found:
+            problems.append(f"{statement_type} statement not extracted")
+    return problems
+
+def check_xbrl_parse(xbrl_json, case):
+    problems = []
+    for concept, count in case["truth"]["facts_per_concept"].items():
+        parsed = max(len(statement.get(concept, [])) for statement in xbrl_json.values())
+        if parsed != count:
+            problems.append(f"{concept}: {parsed} facts, expected {count}")
+    return problems
+
+def run_xbrl_frames(xbrl_json):
+    return [builder(xbrl_json, include_segments) for builder in (get_income_statement, get_balance_sheet,
+                                                                 get_cash_flow_statement)
+            for include_segments in (False, True)]
+
+def check_xbrl_frames(frames, case):
+    years = len(case["truth"]["years"])
+    # The cash flow statement also carries the opening/closing cash balances (instants)
+    expected = {"income": years, "balance": years, "cashflow": 2 * years}
+    problems = []
+    for frame, name in zip(frames[::2], ("income", "balance", "cashflow")):
+        if frame.empty or len(frame.columns) != expected[name]:
+            problems.append(f"{name} statement has {len(frame.columns)} periods, expected {expected[name]}")
+    return problems
+
+BENCHMARKS = {
+    "item7_html": {
+        "kind": "html", "unit": "filings",
+        "setup": lambda case: case["html"],
+        "run": extract_item_7_from_html,
+        "check": check_item_7,
+    },
+    "clean_text": {
+        "kind": "html", "unit": "filings",
+        "setup": lambda case: extract_item_7_from_html(case["html"]),
+        "run": clean_text,
+        "check": check_clean_text,
+    },
+    "fiscal_year_content": {
+        "kind": "html", "unit": "filings",
+        "setup": lambda case: clean_text(extract_item_7_from_html(case["html"])),
+        "run": lambda text: extract_fiscal_year_from_content(text, "primary-document.html"),
+        "check": check_fiscal_year,
+    },
+    "fiscal_year_header": {
+        "kind": "html", "unit": "filings",
+        "setup": lambda case: case["html_path"],
+        "run": resolve_fiscal_year,
+        "check": check_fiscal_year,
+    },
+    "statement_tables": {
+        "kind": "html", "unit": "filings",
+        "setup": lambda case: case["html"],
+        "run": run_statement_tables,
+        "check": check_statement_tables,
+    },
+    "xbrl_parse": {
+        "kind": "xbrl", "unit": "facts",
+        "setup": lambda case: case["xml_path"],
+        "run": parse_xbrl_instance,
+        "check": check_xbrl_parse,
+    },
+    "xbrl_frames": {
+        "kind": "xbrl", "unit": "facts",
+        "setup": lambda case: parse_xbrl_instance(case["xml_path"]),
+        "run": run_xbrl_frames,
+        "check": check_xbrl_frames,
+    },
+}
+
+def build_cases(sizes, xbrl_facts, workdir: Path, seed: int):
+    """Generate the synthetic corpus, writing files where a benchmark reads from disk"""
+    cases = []
+    for i, size_text in enumerate(sizes):
+        # Each case depends only on its size and the seed, so golden digests do not depend on --sizes order
+        html, truth = generate_filing(parse_size(size_text), seed=seed)
+        accession_dir = workdir / f"0000000000-23-{i:06d}"
+        accession_dir.mkdir(parents=True, exist_ok=True)
+        html_path = accession_dir / "primary-document.html"
+        html_path.write_text(html, encoding="utf-8")
+        (accession_dir / "full-submission.txt").write_text(generate_submission_header(int(truth["fiscal_year"])))
+        cases.append({"kind": "html", "name": size_text.upper(), "html": html, "html_path": html_path,
+                      "truth": truth, "bytes": len(html.encode("utf-8")), "items": 1})
+    for num_facts in xbrl_facts:
+        xml, truth = generate_xbrl_instance(num_facts, seed=seed)
+        xml_path = workdir / f"instance_{num_facts}.xml"
+        xml_path.write_text(xml, encoding="utf-8")
+        cases.append({"kind": "xbrl", "name": f"{num_facts}facts", "xml_path": xml_path, "truth": truth,
+                      "bytes": len(xml.encode("utf-8")), "items": truth["facts"]})
+    return cases
+
+def measure(run, value, repeat: int, trace_memory: bool):
+    """Best wall time over repeat runs, then one traced run for peak memory; returns (output, seconds, peak bytes)"""
+    best = None
+    output = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = run(value)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        run(value)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return output, best, peak
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated HTML sizes, e.g. 100K,1M,50M")
+    parser.add_argument("--xbrl-facts", default=DEFAULT_XBRL_FACTS, help="Comma-separated XBRL fact counts")
+    parser.add_argument("--only", help="Comma-separated benchmark names to run")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (the best one is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--json", help="Append one JSON line per result to this file")
+    parser.add_argument("--update-golden", action="store_true", help="Store output digests as the new golden outputs")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmarks: {', '.join(unknown)}")
+
+    golden = json.loads(GOLDEN_PATH.read_text()) if GOLDEN_PATH.exists() else {}
+    results = []
+    failures = 0
+
+    with tempfile.TemporaryDirectory() as workdir:
+        sizes = [s for s in args.sizes.split(",") if s]
+        xbrl_facts = [int(n) for n in args.xbrl_facts.split(",") if n]
+        cases = build_cases(sizes, xbrl_facts, Path(workdir), args.seed)
+
+        print(f"{'benchmark':<22}{'case':<12}{'MB':>9}{'seconds':>10}{'MB/s':>10}{'items/s':>14}{'peak MB':>10}  result")
+        for name in names:
+            bench = BENCHMARKS[name]
+            for case in cases:
+                if case["kind"] != bench["kind"]:
+                    continue
+                value = bench["setup"](case)
+                output, seconds, peak = measure(bench["run"], value, args.repeat, not args.no_memory)
+
+                problems = bench["check"](output, case)
+                key = f"{name}/{case['name']}/seed{args.seed}"
+                output_digest = digest(output)
+                if args.update_golden:
+                    golden[key] = output_digest
+                elif key in golden and golden[key] != output_digest:
+                    problems.append("output differs from golden")
+                failures += bool(problems)
+
+                megabytes = case["bytes"] / 1024 ** 2
+                items_per_second = case["items"] / seconds if seconds else float("inf")
+                result = {
+                    "benchmark": name, "case": case["name"], "bytes": case["bytes"], "seconds": seconds,
+                    "mb_per_second": megabytes / seconds if seconds else None,
+                    f"{bench['unit']}_per_second": items_per_second,
+                    "peak_bytes": peak, "problems": problems, "digest": output_digest,
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                }
+                results.append(result)
+                peak_text = f"{peak / 1024 ** 2:10.1f}" if peak is not None else f"{'-':>10}"
+                print(f"{name:<22}{case['name']:<12}{megabytes:9.2f}{seconds:10.4f}"
+                      f"{megabytes / seconds if seconds else 0:10.1f}"
+                      f"{items_per_second:>10.1f} {bench['unit'][:3]}{peak_text}  "
+                      + ("ok" if not problems else "FAIL: " + "; ".join(problems)))
+
+    if args.update_golden:
+        GOLDEN_PATH.write_text(json.dumps(golden, indent=2, sort_keys=True) + "\n")
+        print(f"Golden outputs written to {GOLDEN_PATH}")
+    if args.json:
+        with open(args.json, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps(result) + "\n")
+
+    print(f"\n{len(results) - failures}/{len(results)} checks passed")
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
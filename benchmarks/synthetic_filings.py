@@ -0,0 +1,209 @@
+"""
+Deterministic synthetic 10-K filings for benchmarks.
+
+generate_filing builds a primary document of roughly the requested size with a
+cover page, a table of contents, filler Items, an Item 7 MD&A section with
+nested tables, and Item 8 statements. generate_xbrl_instance builds a matching
+XBRL instance with thousands of facts. Both return the ground truth the
+benchmark checks extracted output against.
+"""
+import random
+from typing import Dict, Tuple
+
+MDA_BEGIN_MARKER = "MDABEGINSENTINEL"
+MDA_END_MARKER = "MDAENDSENTINEL"
+NOT_MDA_MARKER = "OUTSIDEMDASENTINEL"
+
+WORDS = (
+    "revenue net sales gross margin operating income increased decreased compared prior year "
+    "driven primarily by higher demand customers products services segment region liquidity "
+    "capital resources cash flows operations investing financing debt credit facility interest "
+    "rates foreign currency exchange inflation supply chain costs expenses research development "
+    "selling general administrative tax effective rate share repurchases dividends outlook"
+).split()
+
+STATEMENT_TITLES = {
+    "balance": "Consolidated Balance Sheets",
+    "income": "Consolidated Statement of Operations",
+    "cashflow": "Consolidated Statements of Cash Flows",
+}
+STATEMENT_ROWS = {
+    "balance": ["Cash and cash equivalents", "Accounts receivable, net", "Inventories", "Total current assets",
+                "Property, plant and equipment, net", "Total assets", "Accounts payable", "Total liabilities",
+                "Total shareholders' equity"],
+    "income": ["Net sales", "Cost of sales", "Gross margin", "Research and development",
+               "Selling, general and administrative", "Operating income", "Provision for income taxes",
+               "Net income"],
+    "cashflow": ["Net income", "Depreciation and amortization", "Share-based compensation expense",
+                 "Cash generated by operating activities", "Payments for acquisition of property",
+                 "Cash used in investing activities", "Repurchases of common stock",
+                 "Cash used in financing activities"],
+}
+
+XBRL_CONCEPTS = {
+    "duration": ["Revenues", "CostOfRevenue", "GrossProfit", "OperatingIncomeLoss", "NetIncomeLoss",
+                 "ResearchAndDevelopmentExpense", "NetCashProvidedByUsedInOperatingActivities",
+                 "PaymentsForRepurchaseOfCommonStock", "DepreciationDepletionAndAmortization"],
+    "instant": ["Assets", "Liabilities", "CashAndCashEquivalentsAtCarryingValue", "InventoryNet",
+                "AccountsPayableCurrent", "StockholdersEquity"],
+}
+
+def _sentence(rng: random.Random) -> str:
+    words = [rng.choice(WORDS) for _ in range(rng.randint(12, 28))]
+    words[0] = words[0].capitalize()
+    return " ".join(words) + f" of ${rng.randint(1, 999):,} million."
+
+def _paragraph(rng: random.Random, sentences: int = 6) -> str:
+    return "<p>" + " ".join(_sentence(rng) for _ in range(sentences)) + "</p>\n"
+
+def _figures_table(rng: random.Random, rows, years, nested: bool = False) -> str:
+    """A financial table wrapped in divs, optionally with a table nested in a cell"""
+    header = "".join(f'<td colspan="2"><b>{year}</b></td>' for year in years)
+    body = []
+    for label in rows:
+        cells = "".join(f"<td>$</td><td>{rng.randint(100, 99999):,}</td>" for _ in years)
+        body.append(f"<tr><td>{label}</td>{cells}</tr>")
+    if nested:
+        inner = "".join(f"<tr><td>{rng.choice(WORDS)}</td><td>{rng.randint(1, 99)}%</td></tr>" for _ in range(3))
+        body.append(f'<tr><td colspan="{1 + 2 * len(years)}"><table>{inner}</table></td></tr>')
+    return f"<div><div><table><tr><td></td>{header}</tr>{''.join(body)}</table></div></div>\n"
+
+def generate_filing(target_bytes: int, seed: int = 0, fiscal_year: int = 2023) -> Tuple[str, Dict]:
+    """
+    Return (html, truth) for a synthetic 10-K of about target_bytes. truth holds the
+    fiscal year, the MD&A sentinels, the body rows of each statement table
+    and the number of MD&A paragraphs.
+    """
+    rng = random.Random(seed)
+    years = [fiscal_year, fiscal_year - 1, fiscal_year - 2]
+
+    # Fixed parts first, then filler split between Item 1, MD&A and the notes
+    head = [
+        "<html><head><title>10-K</title><style>p { margin: 0 }</style>",
+        "<script>var tracking = 'Item 7. Management’s Discussion and Analysis';</script></head><body>\n",
+        "<div><p><b>UNITED STATES SECURITIES AND EXCHANGE COMMISSION</b></p><p><b>FORM 10-K</b></p>",
+        f"<p>ANNUAL REPORT PURSUANT TO SECTION 13 OR 15(d) FOR THE FISCAL YEAR ENDED SEPTEMBER 30, {fiscal_year}</p></div>\n",
+        "<table>",
+    ]
+    toc = [
+        ("Item 1.", "Business", 1), ("Item 1A.", "Risk Factors", 5), ("Item 2.", "Properties", 17),
+        ("Item 7.", "Management’s Discussion and Analysis of Financial Condition and Results of Operations", 20),
+        ("Item 7A.", "Quantitative and Qualitative Disclosures About Market Risk", 27),
+        ("Item 8.", "Financial Statements and Supplementary Data", 28),
+    ]
+    head.extend(f"<tr><td>{item}</td><td>{title}</td><td>{page}</td></tr>" for item, title, page in toc)
+    head.append("</table>\n")
+
+    statements = []
+    for statement_type, title in STATEMENT_TITLES.items():
+        statements.append(f"<p><b>{title}</b></p>\n<p>(In millions)</p>\n")
+        statements.append(_figures_table(rng, STATEMENT_ROWS[statement_type], years))
+
+    fixed = sum(len(part) for part in head) + sum(len(part) for part in statements) + 2000
+    filler = max(target_bytes - fixed, 30000)
+    paragraph_bytes = len(_paragraph(random.Random(seed), 6)) or 1
+    filler_paragraphs = max(filler // paragraph_bytes, 30)
+    item1_paragraphs = filler_paragraphs // 3
+    mda_paragraphs = filler_paragraphs // 3
+    notes_paragraphs = filler_paragraphs - item1_paragraphs - mda_paragraphs
+
+    parts = list(head)
+    parts.append("<p><b>PART I</b></p><p><b>Item 1. Business</b></p>\n")
+    parts.append(f"<p>{NOT_MDA_MARKER} This section describes the business.</p>\n")
+    parts.extend(_paragraph(rng) for _ in range(item1_paragraphs))
+
+    parts.append("<p><b>PART II</b></p>\n")
+    parts.append("<p><b>Item 7. Management’s Discussion and Analysis of Financial Condition "
+                 "and Results of Operations</b></p>\n")
+    parts.append(f"<p>{MDA_BEGIN_MARKER} The following discussion of results for the fiscal year ended "
+                 f"September 30, {fiscal_year} should be read together with the consolidated financial "
+                 "statements.</p>\n")
+    for i in range(mda_paragraphs):
+        parts.append(_paragraph(rng))
+        if i % 25 == 10:
+            parts.append(_figures_table(rng, STATEMENT_ROWS["income"][:4], years, nested=True))
+    parts.append(f"<p>Our outlook remains unchanged. {MDA_END_MARKER}</p>\n")
+
+    parts.append("<p><b>Item 7A. Quantitative and Qualitative Disclosures About Market Risk</b></p>\n")
+    parts.append(f"<p>{NOT_MDA_MARKER} Interest rate and currency risk.</p>\n")
+    parts.append("<p><b>Item 8. Financial Statements and Supplementary Data</b></p>\n")
+    parts.extend(statements)
+    parts.append("<p><b>Notes to Consolidated Financial Statements</b></p>\n")
+    parts.extend(_paragraph(rng) for _ in range(notes_paragraphs))
+    parts.append("</body></html>\n")
+
+    truth = {
+        "fiscal_year": str(fiscal_year),
+        "mda_begin": MDA_BEGIN_MARKER,
+        "mda_end": MDA_END_MARKER,
+        "not_mda": NOT_MDA_MARKER,
+        "mda_paragraphs": mda_paragraphs,
+        "statements": {statement_type: len(rows) for statement_type, rows in STATEMENT_ROWS.items()},
+        "years": [str(year) for year in years],
+    }
+    return "".join(parts), truth
+
+def generate_submission_header(fiscal_year: int = 2023, accession: str = "0000000000-23-000001") -> str:
+    """Start of a full-submission.txt with the fields resolve_fiscal_year reads"""
+    return (
+        "<SEC-DOCUMENT>\n<SEC-HEADER>\n"
+        f"ACCESSION NUMBER:\t\t{accession}\n"
+        "CONFORMED SUBMISSION TYPE:\t10-K\n"
+        "PUBLIC DOCUMENT COUNT:\t\t90\n"
+        f"CONFORMED PERIOD OF REPORT:\t{fiscal_year}0930\n"
+        f"FILED AS OF DATE:\t\t{fiscal_year}1103\n"
+        "</SEC-HEADER>\n"
+    )
+
+def generate_xbrl_instance(num_facts: int, seed: int = 0, fiscal_year: int = 2023) -> Tuple[str, Dict]:
+    """
+    Return (xml, truth) for an XBRL instance with num_facts numeric facts over three
+    fiscal years, spread over as many segment members as needed. truth holds the
+    number of facts written per concept.
+    """
+    rng = random.Random(seed)
+    years = [fiscal_year - offset for offset in range(3)]
+    facts_per_member = len(years) * sum(len(concepts) for concepts in XBRL_CONCEPTS.values())
+    segments = max(0, -(-num_facts // facts_per_member) - 1)
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        '<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" '
+        'xmlns:xbrldi="http://xbrl.org/2006/xbrldi" xmlns:us-gaap="http://fasb.org/us-gaap/2023" '
+        'xmlns:dei="http://xbrl.sec.gov/dei/2023" xmlns:iso4217="http://www.xbrl.org/2003/iso4217">\n',
+        '<xbrli:unit id="usd"><xbrli:measure>iso4217:USD</xbrli:measure></xbrli:unit>\n',
+    ]
+
+    contexts = []
+    for year in years:
+        for member in [None] + [f"Segment{i}Member" for i in range(segments)]:
+            for period_type in ("duration", "instant"):
+                context_id = f"c{len(contexts)}"
+                if period_type == "duration":
+                    period = f"<xbrli:startDate>{year - 1}-10-01</xbrli:startDate><xbrli:endDate>{year}-09-30</xbrli:endDate>"
+                else:
+                    period = f"<xbrli:instant>{year}-09-30</xbrli:instant>"
+                segment = ""
+                if member:
+                    segment = ("<xbrli:segment><xbrldi:explicitMember dimension=\"us-gaap:StatementBusinessSegmentsAxis\">"
+                               f"us-gaap:{member}</xbrldi:explicitMember></xbrli:segment>")
+                parts.append(f'<xbrli:context id="{context_id}"><xbrli:entity>'
+                             f'<xbrli:identifier scheme="http://www.sec.gov/CIK">0000000000</xbrli:identifier>'
+                             f'{segment}</xbrli:entity><xbrli:period>{period}</xbrli:period></xbrli:context>\n')
+                contexts.append((context_id, period_type))
+
+    parts.append('<dei:DocumentFiscalYearFocus contextRef="c0">%d</dei:DocumentFiscalYearFocus>\n' % fiscal_year)
+    facts_per_concept = {}
+    written = 0
+    for context_id, period_type in contexts:
+        for concept in XBRL_CONCEPTS[period_type]:
+            if written >= num_facts:
+                break
+            value = rng.randint(1000, 10 ** 9)
+            parts.append(f'<us-gaap:{concept} contextRef="{context_id}" unitRef="usd" decimals="-6">'
+                         f'{value}</us-gaap:{concept}>\n')
+            facts_per_concept[concept] = facts_per_concept.get(concept, 0) + 1
+            written += 1
+    parts.append("</xbrli:xbrl>\n")
+
+    truth = {"facts": written, "facts_per_concept": facts_per_concept, "years": [str(year) for year in years]}
+    return "".join(parts), truth
@@ -1,10 +1,50 @@
-from sec_edgar_downloader import Downloader
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
 from enum import Enum
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Set, Tuple
+import heapq
+import json
 import os
 import re
-from bs4 import BeautifulSoup
+import sqlite3
+import threading
+import time
+# sec_edgar_downloader and bs4 are imported where they are used, keeping this module cheap to import
+from html_stream import clean_text, iter_file_chunks, iter_string_chunks, stream_html_text
+from filing_cache import get_filing_text
+from mda_search import update_index
+from metrics import BYTES_BUCKETS, export_metrics, metrics
+
+if TYPE_CHECKING:
+    from sec_edgar_downloader import Downloader
+
+# SEC fair-access policy: no more than 10 requests per second per client
+SEC_MAX_REQUESTS_PER_SECOND = 10
+SEC_USER_AGENT = "MyCompany myemail@example.com"  # same identity the Downloader is created with
+
+# Filings are fetched from EDGAR directly rather than through Downloader.get, which
+# paces its own requests and always saves full-submission.txt (the primary document
+# plus every exhibit); the Downloader only supplies the ticker-to-CIK mapping
+SEC_SUBMISSIONS_URL = "https://data.sec.gov/submissions/{name}"
+SEC_ARCHIVES_URL = "https://www.sec.gov/Archives/edgar/data/{cik}/{accession}/{document}"
+FULL_SUBMISSION_NAME = "full-submission.txt"
+SUBMISSION_HEADER_NAME = "submission-header.txt"
+PRIMARY_DOCUMENT_STEM = "primary-document"
+
+# Per-file progress output is opt-in: set EDGAR_VERBOSE=1 or call set_verbose(True)
+VERBOSE = os.environ.get("EDGAR_VERBOSE", "") not in ("", "0")
+
+def set_verbose(enabled: bool):
+    """Turn per-file progress output on or off, including in extraction worker processes"""
+    global VERBOSE
+    VERBOSE = enabled
+    os.environ["EDGAR_VERBOSE"] = "1" if enabled else "0"
+
+def _verbose(message: str):
+    if VERBOSE:
+        print(message)
 
 # Define filing types available in SEC EDGAR
 class FilingType(str, Enum):
@@ -33,9 +73,268 @@ def get_filing_types():
     """Return a list of available filing types"""
     return [filing.value for filing in FilingType]
 
-def download_edgar_filings(ticker: str, filing_type: str, years_back: int, cik: str = None):
+class TokenBucket:
+    """Thread-safe token bucket shared by every worker of a bulk download"""
+
+    def __init__(self, rate: float = SEC_MAX_REQUESTS_PER_SECOND, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1):
+        """Block until `tokens` are available, then consume them"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+class FilingManifest:
+    """
+    Persistent record of the accession numbers already downloaded and extracted
+    for each identifier/filing type, plus the date of the last download run.
+    Stored as JSON under the data directory so incremental runs can skip work.
+    """
+
+    def __init__(self, path: Path, entries: Optional[Dict[str, dict]] = None):
+        self.path = Path(path)
+        self.entries = entries or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path = Path("edgar_data") / "download_manifest.json") -> "FilingManifest":
+        path = Path(path)
+        if path.exists():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    return cls(path, json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Warning: ignoring unreadable manifest {path}: {str(e)}")
+        return cls(path)
+
+    def save(self):
+        """Write the manifest atomically so a crash never leaves it half-written"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with self._lock:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+
+    def _entry(self, identifier: str, filing_type: str) -> dict:
+        return self.entries.setdefault(
+            f"{identifier}/{filing_type}",
+            {"last_run": None, "downloaded": [], "extracted": {}}
+        )
+
+    def last_run(self, identifier: str, filing_type: str) -> Optional[str]:
+        with self._lock:
+            return self._entry(identifier, filing_type)["last_run"]
+
+    def downloaded(self, identifier: str, filing_type: str) -> Set[str]:
+        with self._lock:
+            return set(self._entry(identifier, filing_type)["downloaded"])
+
+    def record_download(self, identifier: str, filing_type: str, filing_dir: Path, run_date: Optional[str]):
+        """
+        Register every accession directory on disk that holds its primary document,
+        and stamp the run date. Pass run_date=None when some filings failed, so the
+        next incremental window still covers them.
+        """
+        accessions = [
+            p.name for p in filing_dir.iterdir() if p.is_dir() and _has_primary_document(p)
+        ] if filing_dir.exists() else []
+        with self._lock:
+            entry = self._entry(identifier, filing_type)
+            entry["downloaded"] = sorted(set(entry["downloaded"]) | set(accessions))
+            if run_date:
+                entry["last_run"] = run_date
+
+    def is_extracted(self, identifier: str, filing_type: str, accession: str) -> bool:
+        with self._lock:
+            return accession in self._entry(identifier, filing_type)["extracted"]
+
+    def mark_extracted(self, identifier: str, filing_type: str, accession: str, output_name: Optional[str]):
+        """Remember an accession as processed; output_name is None when no MD&A was found"""
+        with self._lock:
+            self._entry(identifier, filing_type)["extracted"][accession] = output_name
+
+def _incremental_after(manifest: FilingManifest, identifier: str, filing_type: str, after: str) -> str:
+    """Move the start of a date window up to the last recorded run, if later"""
+    last_run = manifest.last_run(identifier, filing_type)
+    return max(after, last_run) if last_run else after
+
+@dataclass
+class DownloadJob:
+    """One (ticker/CIK, form, date range) unit of work for a bulk download"""
+    identifier: str
+    filing_type: str
+    after: str
+    before: str
+
+@dataclass
+class DownloadResult:
+    """Outcome of a single DownloadJob"""
+    job: DownloadJob
+    success: bool
+    num_downloaded: int = 0
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+_edgar_session = None
+
+def _get_edgar_session():
+    """Shared requests session for EDGAR, retrying 429 and 5xx responses with backoff"""
+    global _edgar_session
+    if _edgar_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retry = Retry(total=5, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",), respect_retry_after_header=True)
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(max_retries=retry))
+        session.headers.update({"User-Agent": SEC_USER_AGENT, "Accept-Encoding": "gzip, deflate"})
+        _edgar_session = session
+    return _edgar_session
+
+def _edgar_get(url: str, rate_limiter: TokenBucket):
+    rate_limiter.acquire()
+    response = _get_edgar_session().get(url, timeout=60)
+    response.raise_for_status()
+    return response
+
+def _cik_for(dl: "Downloader", identifier: str) -> str:
+    """10-digit CIK of a ticker or CIK, using the ticker list the Downloader already fetched"""
+    if identifier.isdigit():
+        return identifier.zfill(10)
+    cik = dl.ticker_to_cik_mapping.get(identifier.upper())
+    if cik is None:
+        raise ValueError(f"Ticker {identifier} not found in SEC's company list")
+    return cik
+
+def list_primary_documents(cik: str, filing_type: str, after: str, before: str,
+                           rate_limiter: TokenBucket) -> List[dict]:
+    """
+    Filings of one form filed between after and before (YYYY-MM-DD) from EDGAR's
+    submissions API: accession number, primary document name, filing date and
+    period of report. Amendments are left out, as with Downloader.get.
+    """
+    pages = [f"CIK{cik}.json"]
+    filings = []
+    while pages:
+        data = _edgar_get(SEC_SUBMISSIONS_URL.format(name=pages.pop(0)), rate_limiter).json()
+        # The first page holds the recent filings and lists the pages of older ones
+        if "filings" in data:
+            recent = data["filings"]["recent"]
+            pages.extend(page["name"] for page in data["filings"].get("files", [])
+                         if page.get("filingTo", before) >= after)
+        else:
+            recent = data
+        report_dates = recent.get("reportDate") or [""] * len(recent["accessionNumber"])
+        for accession, form, document, filed, period in zip(recent["accessionNumber"], recent["form"],
+                                                            recent["primaryDocument"], recent["filingDate"],
+                                                            report_dates):
+            if form == filing_type and document and after <= filed <= before:
+                # XML forms (4, 13F-HR) list an XSL-rendered view such as "xslF345X05/form4.xml";
+                # the raw document is the file name alone
+                filings.append({"accession": accession, "document": document.rsplit("/")[-1], "filed": filed,
+                                "period": period})
+    return filings
+
+def _has_primary_document(accession_dir: Path) -> bool:
+    return any(accession_dir.glob(f"{PRIMARY_DOCUMENT_STEM}.*"))
+
+def _save_archive_file(cik: str, accession: str, document: str, path: Path, filing_type: str,
+                       rate_limiter: TokenBucket):
+    """Fetch one file of a filing from the EDGAR archive into path, unless it is already there"""
+    if path.exists():
+        return
+    url = SEC_ARCHIVES_URL.format(cik=cik.lstrip("0"), accession=accession.replace("-", ""), document=document)
+    content = _edgar_get(url, rate_limiter).content
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(content)
+    os.replace(tmp_path, path)
+    metrics.inc("bytes_downloaded_total", len(content), form=filing_type)
+
+def _download_primary_documents(cik: str, filing_dir: Path, filing_type: str, filings: List[dict],
+                                rate_limiter: TokenBucket, include_full_submission: bool = False) -> int:
+    """
+    Save the primary document of each listed filing, as primary-document.html
+    like Downloader.get does, plus either full-submission.txt (include_full_submission)
+    or a short submission-header.txt with the period of report and filing date for
+    resolve_fiscal_year. Files already on disk are not fetched again. Returns the
+    number of filings available on disk.
+    """
+    saved = 0
+    for filing in filings:
+        accession_dir = filing_dir / filing["accession"]
+        suffix = Path(filing["document"]).suffix.lower()
+        document_path = accession_dir / f"{PRIMARY_DOCUMENT_STEM}{'.html' if suffix in ('.htm', '.html') else suffix}"
+        try:
+            _save_archive_file(cik, filing["accession"], filing["document"], document_path, filing_type, rate_limiter)
+            header_path = accession_dir / SUBMISSION_HEADER_NAME
+            if include_full_submission:
+                # The complete submission text file is named after the accession number
+                _save_archive_file(cik, filing["accession"], f"{filing['accession']}.txt",
+                                   accession_dir / FULL_SUBMISSION_NAME, filing_type, rate_limiter)
+            elif not header_path.exists():
+                lines = [f"ACCESSION NUMBER:\t\t{filing['accession']}", f"CONFORMED SUBMISSION TYPE:\t{filing_type}"]
+                if filing["period"]:
+                    lines.append(f"CONFORMED PERIOD OF REPORT:\t{filing['period'].replace('-', '')}")
+                lines.append(f"FILED AS OF DATE:\t\t{filing['filed'].replace('-', '')}")
+                header_path.write_text("\n".join(lines) + "\n", encoding="ascii")
+        except Exception as e:
+            print(f"Error downloading {filing['accession']}: {str(e)}")
+            metrics.inc("failures_total", stage="download", reason=type(e).__name__)
+            continue
+        saved += 1
+    return saved
+
+def _download_filings(dl: "Downloader", identifier: str, filing_type: str, after: str, before: str,
+                      rate_limiter: Optional[TokenBucket] = None, include_full_submission: bool = False,
+                      skip_accessions: Optional[Set[str]] = None) -> Tuple[int, List[str]]:
+    """
+    Download one identifier and form: the primary documents, plus full-submission.txt
+    with include_full_submission. Accessions in skip_accessions are not fetched again.
+    Every request, including the filing list, waits on the shared rate limiter.
+    Returns the number of filings downloaded and the accessions in the window that
+    are still missing from disk (failed downloads).
+    """
+    rate_limiter = rate_limiter or TokenBucket(SEC_MAX_REQUESTS_PER_SECOND)
+    skip_accessions = set(skip_accessions or ())
+    filing_dir = Path(dl.download_folder) / "sec-edgar-filings" / identifier / filing_type
+    with metrics.timer("download", form=filing_type):
+        try:
+            cik = _cik_for(dl, identifier)
+            filings = [f for f in list_primary_documents(cik, filing_type, after, before, rate_limiter)
+                       if f["accession"] not in skip_accessions]
+            num_downloaded = _download_primary_documents(cik, filing_dir, filing_type, filings, rate_limiter,
+                                                         include_full_submission)
+        except Exception as e:
+            metrics.inc("failures_total", stage="download", reason=type(e).__name__)
+            raise
+    metrics.inc("filings_downloaded_total", num_downloaded, form=filing_type)
+    missing = [f["accession"] for f in filings if not _has_primary_document(filing_dir / f["accession"])]
+    return num_downloaded, missing
+
+def download_edgar_filings(ticker: str, filing_type: str, years_back: int, cik: str = None,
+                           rate_limiter: Optional[TokenBucket] = None, incremental: bool = False,
+                           include_full_submission: bool = False):
     """
     Download SEC filings for a given ticker, filing type, and years back.
+    With incremental=True only filings dated since the last recorded run are requested.
+    Only each filing's primary document is saved unless include_full_submission=True,
+    which also saves full-submission.txt with every exhibit.
     Returns a tuple: (success_status, number_of_filings, data_directory)
     """
     # Set the data directory
@@ -43,6 +342,8 @@ def download_edgar_filings(ticker: str, filing_type: str, years_back: int, cik:
     data_dir.mkdir(exist_ok=True)  # Ensure the data directory exists
     
     # Initialize downloader
+    from sec_edgar_downloader import Downloader
+
     dl = Downloader("MyCompany", "myemail@example.com", data_dir)
     
     # Calculate date ranges based on user input
@@ -58,24 +359,41 @@ def download_edgar_filings(ticker: str, filing_type: str, years_back: int, cik:
         else:
             raise ValueError("Either a ticker or CIK number must be provided.")
         
+        after = f"{start_year}-01-01"
+        manifest = FilingManifest.load(data_dir / "download_manifest.json") if incremental else None
+        if manifest:
+            after = _incremental_after(manifest, identifier, filing_type, after)
+            print(f"Incremental mode: requesting filings since {after}")
+
         # Download the filings
         try:
-            num_downloaded = dl.get(
-                filing_type,
+            num_downloaded, missing = _download_filings(
+                dl,
                 identifier,
-                after=f"{start_year}-01-01",
+                filing_type,
+                after=after,
                 before=f"{today}-12-31",
-                download_details=True
+                rate_limiter=rate_limiter,
+                include_full_submission=include_full_submission,
+                skip_accessions=manifest.downloaded(identifier, filing_type) if manifest else None
             )
             print(f"Downloaded {num_downloaded} filings")
+            if missing:
+                print(f"Warning: {len(missing)} filings could not be downloaded: {', '.join(missing)}")
             
             # Find the directory where filings were downloaded
             filing_dir = data_dir / "sec-edgar-filings" / identifier / filing_type
-            print(f"Looking for filings in: {filing_dir}")
+            _verbose(f"Looking for filings in: {filing_dir}")
             
             if not filing_dir.exists() and num_downloaded > 0:
-                print(f"Warning: .get() reported success but directory not found at {filing_dir}")
+                print(f"Warning: download reported success but directory not found at {filing_dir}")
                 return False, 0, data_dir
+
+            if manifest:
+                # Failed filings keep the window open so the next run retries them
+                run_date = None if missing else datetime.now().strftime("%Y-%m-%d")
+                manifest.record_download(identifier, filing_type, filing_dir, run_date)
+                manifest.save()
                 
             return True, num_downloaded, data_dir
             
@@ -87,14 +405,221 @@ def download_edgar_filings(ticker: str, filing_type: str, years_back: int, cik:
         print(f"Exception occurred: {str(e)}")
         return False, 0, data_dir
 
+def build_download_jobs(identifiers: List[str], filing_types: List[str], years_back: int) -> List[DownloadJob]:
+    """Build one DownloadJob per identifier and filing type covering the last `years_back` years"""
+    today = datetime.now().year
+    start_year = today - years_back
+    return [
+        DownloadJob(identifier, filing_type, f"{start_year}-01-01", f"{today}-12-31")
+        for identifier in identifiers
+        for filing_type in filing_types
+    ]
+
+def download_edgar_filings_bulk(jobs: List[DownloadJob], max_workers: int = 4,
+                                rate_limiter: Optional[TokenBucket] = None,
+                                incremental: bool = False,
+                                include_full_submission: bool = False) -> List[DownloadResult]:
+    """
+    Download many (identifier, filing type, date range) jobs through a bounded
+    thread pool. All workers draw from one token bucket so the whole pool stays
+    within SEC's fair-access rate. With incremental=True each job's window starts
+    at its last recorded run. include_full_submission is as for download_edgar_filings.
+    Returns one DownloadResult per job, in job order.
+    """
+    from sec_edgar_downloader import Downloader
+
+    data_dir = Path("edgar_data")
+    data_dir.mkdir(exist_ok=True)
+    manifest = FilingManifest.load(data_dir / "download_manifest.json") if incremental else None
+    run_date = datetime.now().strftime("%Y-%m-%d")
+
+    if rate_limiter is None:
+        rate_limiter = TokenBucket(SEC_MAX_REQUESTS_PER_SECOND)
+
+    # Downloader instances are not shared between threads
+    local = threading.local()
+
+    def run_job(job: DownloadJob) -> DownloadResult:
+        started = time.monotonic()
+        if not getattr(local, "dl", None):
+            local.dl = Downloader("MyCompany", "myemail@example.com", data_dir)
+        try:
+            after = _incremental_after(manifest, job.identifier, job.filing_type, job.after) if manifest else job.after
+            num_downloaded, missing = _download_filings(
+                local.dl, job.identifier, job.filing_type, after, job.before, rate_limiter,
+                include_full_submission,
+                manifest.downloaded(job.identifier, job.filing_type) if manifest else None
+            )
+            if manifest:
+                filing_dir = data_dir / "sec-edgar-filings" / job.identifier / job.filing_type
+                manifest.record_download(job.identifier, job.filing_type, filing_dir, None if missing else run_date)
+            error = f"{len(missing)} filings could not be downloaded" if missing else None
+            return DownloadResult(job, True, num_downloaded, error=error, elapsed=time.monotonic() - started)
+        except Exception as e:
+            return DownloadResult(job, False, error=str(e), elapsed=time.monotonic() - started)
+
+    results: List[Optional[DownloadResult]] = [None] * len(jobs)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_job, job): i for i, job in enumerate(jobs)}
+        for future in as_completed(futures):
+            result = future.result()
+            results[futures[future]] = result
+            status = "✅" if result.success else "❌"
+            print(f"{status} {result.job.identifier} {result.job.filing_type}: "
+                  f"{result.num_downloaded} filings ({result.elapsed:.1f}s)"
+                  + (f" - {result.error}" if result.error else ""))
+
+    if manifest:
+        manifest.save()
+
+    succeeded = sum(1 for r in results if r.success)
+    print(f"\nBulk download finished: {succeeded}/{len(jobs)} jobs succeeded")
+    return results
+
+# Start of an Item 7 section, in order of preference (see extract_item_7_from_html_bs4)
+ITEM_7_START_PATTERNS = [
+    re.compile(r"Item\s+7\.\s+Management[''`s]{0,2}\s+Discussion\s+and\s+Analysis", re.IGNORECASE),
+    re.compile(r"Management[''`s]{0,2}\s+Discussion\s+and\s+Analysis", re.IGNORECASE),
+    re.compile(r"MD&A", re.IGNORECASE),
+    re.compile(r"Item\s+7\.", re.IGNORECASE),
+]
+ITEM_7_END_PATTERN = re.compile(r"Item\s+7A\.|Item\s+8\.", re.IGNORECASE)
+
+# Text kept behind the scan position so a heading split across text nodes is still seen
+_SCAN_LOOKBACK = 512
+# Amount of new text gathered before the patterns are re-run
+_SCAN_BATCH = 1 << 16
+
+class _Item7Scanner:
+    """
+    Finds Item 7 sections in a stream of text pieces in one linear pass. For each
+    start pattern it tracks the open section (if any) and the longest finished
+    one, and only keeps text from the earliest open section onwards.
+    """
+
+    def __init__(self):
+        self._buf = ""
+        self._base = 0  # absolute offset of self._buf[0]
+        self._pieces = []
+        self._pending_size = 0
+        self._seen_text = False
+        self._states = [
+            {"pattern": pattern, "pos": 0, "start": None, "best": None}
+            for pattern in ITEM_7_START_PATTERNS
+        ]
+
+    def feed(self, text: str, join: bool = True):
+        """Add text; join=False appends it as-is instead of as a separate text node"""
+        if self._seen_text and join:
+            self._pieces.append(" ")
+        self._seen_text = True
+        self._pieces.append(text)
+        self._pending_size += len(text) + 1
+        if self._pending_size >= _SCAN_BATCH:
+            self._scan(final=False)
+
+    def _scan(self, final: bool):
+        self._buf += "".join(self._pieces)
+        self._pieces = []
+        self._pending_size = 0
+        buf, base = self._buf, self._base
+        safe_pos = base + max(0, len(buf) - _SCAN_LOOKBACK)
+
+        for state in self._states:
+            while True:
+                if state["start"] is None:
+                    match = state["pattern"].search(buf, state["pos"] - base)
+                    if not match:
+                        state["pos"] = max(state["pos"], safe_pos)
+                        break
+                    state["start"] = base + match.start()
+                    state["pos"] = base + match.end()
+                else:
+                    match = ITEM_7_END_PATTERN.search(buf, state["pos"] - base)
+                    if not match:
+                        state["pos"] = max(state["pos"], safe_pos)
+                        break
+                    self._finish(state, buf[state["start"] - base:match.start()])
+                    state["start"] = None
+                    state["pos"] = base + match.start()
+
+            if final and state["start"] is not None:
+                # An open section runs to the end of the document
+                self._finish(state, buf[state["start"] - base:])
+                state["start"] = None
+
+        # Drop text no state can look at again
+        keep_from = min(s["start"] if s["start"] is not None else s["pos"] for s in self._states)
+        if keep_from > base:
+            self._buf = buf[keep_from - base:]
+            self._base = keep_from
+
+    @staticmethod
+    def _finish(state: dict, section: str):
+        if state["best"] is None or len(section) > len(state["best"]):
+            state["best"] = section
+
+    def result(self) -> Optional[str]:
+        """Longest section for the first start pattern that matched at all"""
+        self._scan(final=True)
+        for state in self._states:
+            if state["best"] is not None:
+                return state["best"]
+        return None
+
+def _extract_item_7_from_chunks(chunks, is_html: bool = True) -> str:
+    scanner = _Item7Scanner()
+    if is_html:
+        stream_html_text(chunks, scanner.feed)
+    else:
+        for chunk in chunks:
+            scanner.feed(chunk, join=False)
+    item_7_section = scanner.result()
+
+    if item_7_section is None:
+        return "Item 7 not found"
+
+    item_7_section = item_7_section.strip()
+    if len(item_7_section) < 1000:
+        return "Extracted Item 7 too short"
+
+    return item_7_section
+
 def extract_item_7_from_html(html_content):
     """
     Extracts Item 7 (MD&A) section from HTML, starting at actual heading (not TOC),
     and ending at Item 7A or Item 8.
+    Tokenizes the document once and finds section boundaries in a single pass.
+    """
+    if not html_content or len(html_content) < 1000:
+        return "File too small or empty"
+
+    return _extract_item_7_from_chunks(iter_string_chunks(html_content))
+
+def extract_item_7_from_file(file_path, use_cache: bool = True):
+    """
+    Same as extract_item_7_from_html for a document on disk. By default the scan runs
+    over the document's cached plain text (see filing_cache); with use_cache=False
+    the HTML is streamed from disk in bounded memory instead.
+    """
+    if Path(file_path).stat().st_size < 1000:
+        return "File too small or empty"
+
+    if use_cache:
+        return _extract_item_7_from_chunks(iter_string_chunks(get_filing_text(file_path)), is_html=False)
+    return _extract_item_7_from_chunks(iter_file_chunks(file_path))
+
+def extract_item_7_from_html_bs4(html_content):
+    """
+    Reference Item 7 extractor: builds a full BeautifulSoup tree, flattens it with
+    get_text and runs the regex patterns over the whole document. Kept to check
+    the streaming extractor's output against.
     """
     if not html_content or len(html_content) < 1000:
         return "File too small or empty"
 
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html_content, 'html.parser')
     text = soup.get_text(" ", strip=True)
 
@@ -126,60 +651,290 @@ def extract_item_7_from_html(html_content):
 
     return item_7_section
 
-def clean_text(text):
-    """Clean and normalize extracted text"""
-    if not text or "not found" in text.lower():
-        return text
-    
-    # Replace non-breaking spaces and normalize whitespace
-    text = re.sub(r'\s+', ' ', text.replace('\xa0', ' ')).strip()
-    
-    # Remove control characters
-    text = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', text)
-    
-    return text
+# The SEC header at the top of full-submission.txt (or submission-header.txt) states the period of report
+SUBMISSION_HEADER_BYTES = 8192
+SUBMISSION_HEADER_PATTERN = re.compile(rb"(CONFORMED PERIOD OF REPORT|FILED AS OF DATE):\s*(\d{8})")
+# The first document of a full submission is the primary document
+SUBMISSION_DOCUMENT_SCAN_BYTES = 1 << 16
+SUBMISSION_FILENAME_PATTERN = re.compile(rb"<FILENAME>\s*([^\s<]+)")
+
+# Fiscal-year phrases in order of preference (lowest group number wins), found in
+# one pass over the start of the MD&A text only
+FISCAL_YEAR_SCAN_CHARS = 20000
+_MONTHS = r"(?:January|February|March|April|May|June|July|August|September|October|November|December)"
+FISCAL_YEAR_PATTERN = re.compile(
+    r"fiscal\s+year\s+ended\s+[^.]{0,40}?\b(20\d{2})\b"
+    r"|for\s+the\s+year\s+ended\s+[^.]{0,40}?\b(20\d{2})\b"
+    rf"|{_MONTHS}\s+\d{{1,2}},?\s+(20\d{{2}})"
+    r"|\bFY\s*(20\d{2})"
+    r"|\b(20\d{2})\s+Annual\s+Report",
+    re.IGNORECASE,
+)
+ACCESSION_PATTERN = re.compile(r"(\d{10})-(\d{2})-(\d{6})")
+FILENAME_YEAR_PATTERN = re.compile(r"(20\d{2})")
+
+def read_submission_header(filing_dir: Path) -> Dict[str, str]:
+    """
+    Period of report and filing date (YYYYMMDD) from the header of the
+    full-submission.txt or submission-header.txt in a filing's accession
+    directory; empty if there is neither.
+    """
+    header = b""
+    for name in (FULL_SUBMISSION_NAME, SUBMISSION_HEADER_NAME):
+        try:
+            with open(Path(filing_dir) / name, "rb") as f:
+                header = f.read(SUBMISSION_HEADER_BYTES)
+            break
+        except OSError:
+            continue
+    fields = {}
+    for name, value in SUBMISSION_HEADER_PATTERN.findall(header):
+        key = "period_of_report" if name == b"CONFORMED PERIOD OF REPORT" else "filed_as_of"
+        fields.setdefault(key, value.decode("ascii"))
+    return fields
+
+def _fiscal_year_phrase(content: str) -> Optional[str]:
+    """Year from the most preferred fiscal-year phrase in the first FISCAL_YEAR_SCAN_CHARS of content"""
+    best = None
+    for match in FISCAL_YEAR_PATTERN.finditer(content, 0, FISCAL_YEAR_SCAN_CHARS):
+        group = match.lastindex
+        if best is None or group < best[0]:
+            best = (group, match.group(group))
+            if group == 1:
+                break
+    return best[1] if best else None
 
 def extract_fiscal_year_from_content(content, filename):
-    """Extract fiscal year from text content or filename"""
-    # Try to find year in content
-    year_patterns = [
-        r'fiscal\s+year\s+ended\s+.*?\b(20\d{2})\b',
-        r'for\s+the\s+year\s+ended\s+.*?\b(20\d{2})\b',
-        r'(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+(20\d{2})',
-        r'FY\s*(20\d{2})',
-        r'\b(20\d{2})\s+Annual\s+Report'
-    ]
-    
-    content_lower = content.lower()
-    
-    for pattern in year_patterns:
-        match = re.search(pattern, content_lower)
-        if match:
-            return match.group(1)
+    """Extract fiscal year from the start of the text content or from the filename"""
+    year = _fiscal_year_phrase(content)
+    if year:
+        return year
     
     # Try to extract from filename if it's in SEC format
-    sec_match = re.search(r'(\d{10})-(\d{2})-(\d{6})', filename)
+    sec_match = ACCESSION_PATTERN.search(filename)
     if sec_match:
         file_year = f"20{sec_match.group(2)}"
         return file_year
     
     # Look for any 4-digit year in filename
-    year_match = re.search(r'(20\d{2})', filename)
+    year_match = FILENAME_YEAR_PATTERN.search(filename)
     if year_match:
         return year_match.group(1)
     
     # Default to unknown
     return "unknown_year"
 
-def download_and_extract_mda(ticker: str, filing_type: str, years_back: int, cik: str = None):
+def resolve_fiscal_year(html_file: Path, content: str = "") -> str:
+    """
+    Fiscal year of a downloaded document: the year of the period of report in the
+    filing's submission header, else a fiscal-year phrase near the start of the
+    content, else the filing date, else the accession number or file name.
+    """
+    html_file = Path(html_file)
+    header = read_submission_header(html_file.parent)
+    if "period_of_report" in header:
+        return header["period_of_report"][:4]
+
+    year = _fiscal_year_phrase(content)
+    if year:
+        return year
+    if "filed_as_of" in header:
+        return header["filed_as_of"][:4]
+
+    # The accession number is the name of the directory the document sits in
+    return extract_fiscal_year_from_content("", f"{html_file.parent.name}_{html_file.name}")
+
+def extract_mda_from_file(html_file: Path, mda_output_dir: Path) -> dict:
     """
-    Download SEC filings and extract MD&A sections for a given ticker
+    Extract, clean and save the MD&A section of one downloaded document.
+    Returns a dict with the source file, fiscal year, output path and a status of
+    "extracted", "too_small", "not_found", "write_failed" or "error".
+    """
+    html_file = Path(html_file)
+    result = {"file": str(html_file), "fiscal_year": None, "output_path": None, "status": None, "error": None}
+    try:
+        _verbose(f"\nProcessing file: {html_file.name}")
+
+        # Skip very small files
+        size = html_file.stat().st_size
+        if size < 1000:
+            _verbose(f"❌ Skipped: {html_file.name} - File too small")
+            result["status"] = "too_small"
+            return result
+        metrics.inc("bytes_read_total", size, stage="extract")
+        metrics.observe("filing_bytes", size, buckets=BYTES_BUCKETS)
+
+        # Extract and clean MD&A content
+        with metrics.timer("extract"):
+            mdna_text = extract_item_7_from_file(html_file)
+            clean_mdna_text = clean_text(mdna_text)
+
+        # Validate content
+        if len(clean_mdna_text) > 1000 and "not found" not in clean_mdna_text.lower():
+            fiscal_year = resolve_fiscal_year(html_file, clean_mdna_text)
+            _verbose(f"✅ Found MD&A section for fiscal year {fiscal_year}")
+            result["fiscal_year"] = fiscal_year
+
+            # Every downloaded document is named primary-document, and a fiscal year can
+            # have several filings (10-Qs), so the accession number keeps names unique
+            accession = html_file.parent.name
+            source = f"{accession}_{html_file.stem}" if ACCESSION_PATTERN.fullmatch(accession) else html_file.stem
+            output_filename = f"MDNA_{fiscal_year}_{source}.txt"
+            output_path = Path(mda_output_dir) / output_filename
+
+            # Save through a temp file, so a reader never sees a partly written section
+            with metrics.timer("write"):
+                tmp_path = output_path.with_name(f".{output_filename}.{os.getpid()}.tmp")
+                with open(tmp_path, 'w', encoding='utf-8') as out_file:
+                    out_file.write(clean_mdna_text)
+                os.replace(tmp_path, output_path)
+
+            # Verify the file was created successfully
+            if output_path.exists() and output_path.stat().st_size > 0:
+                _verbose(f"✅ Successfully saved MD&A to: {output_path} ({output_path.stat().st_size} bytes)")
+                metrics.inc("bytes_written_total", output_path.stat().st_size, stage="extract")
+                result["output_path"] = str(output_path)
+                result["status"] = "extracted"
+            else:
+                _verbose(f"❌ Error: File not written properly to {output_path}")
+                result["status"] = "write_failed"
+        else:
+            _verbose(f"❌ No valid MD&A section found in {html_file.name}")
+            result["status"] = "not_found"
+
+    except Exception as e:
+        # Failures are always worth seeing, verbose or not
+        print(f"❌ Error processing {html_file.name}: {str(e)}")
+        result["status"] = "error"
+        result["error"] = str(e)
+    finally:
+        metrics.inc("files_total", stage="extract", status=result["status"])
+        if result["status"] != "extracted":
+            metrics.inc("failures_total", stage="extract", reason=result["status"])
+
+    return result
+
+def _extract_mda_chunk(html_files: List[str], mda_output_dir: str):
+    """Process-pool task: extract one chunk of files; returns the results and the metrics recorded for them"""
+    # A forked worker starts with a copy of the parent's metrics, which must not be sent back
+    metrics.reset()
+    results = [extract_mda_from_file(Path(f), Path(mda_output_dir)) for f in html_files]
+    return results, metrics.snapshot()
+
+def _size_aware_chunks(html_files: List[Path], num_chunks: int) -> List[List[Path]]:
+    """
+    Split files into num_chunks groups of roughly equal total size, assigning the
+    largest files first to the currently lightest group. Heaviest groups come first.
+    """
+    sized = sorted(((f.stat().st_size, f) for f in html_files), key=lambda item: item[0], reverse=True)
+    heap = [(0, i) for i in range(num_chunks)]
+    chunks: List[List[Path]] = [[] for _ in range(num_chunks)]
+    for size, html_file in sized:
+        total, i = heapq.heappop(heap)
+        chunks[i].append(html_file)
+        heapq.heappush(heap, (total + size, i))
+    totals = dict((i, total) for total, i in heap)
+    order = sorted(range(num_chunks), key=lambda i: totals[i], reverse=True)
+    return [chunks[i] for i in order if chunks[i]]
+
+def extract_mda_files(html_files: List[Path], mda_output_dir: Path, max_workers: Optional[int] = None,
+                      chunks_per_worker: int = 4, on_result: Optional[Callable[[dict], None]] = None) -> List[dict]:
+    """
+    Extract MD&A sections from many documents across a process pool.
+    Files are grouped into size-balanced chunks (several per worker so a slow chunk
+    does not hold up the rest). Returns one result dict per file, as produced by
+    extract_mda_from_file; on_result is called with each one as soon as it is in.
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if max_workers <= 1 or len(html_files) <= 1:
+        results = []
+        for f in html_files:
+            results.append(extract_mda_from_file(f, mda_output_dir))
+            if on_result:
+                on_result(results[-1])
+        return results
+
+    num_chunks = min(len(html_files), max_workers * chunks_per_worker)
+    chunks = _size_aware_chunks(html_files, num_chunks)
+    results = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_extract_mda_chunk, [str(f) for f in chunk], str(mda_output_dir))
+            for chunk in chunks
+        ]
+        for future in as_completed(futures):
+            chunk_results, chunk_metrics = future.result()
+            metrics.merge(chunk_metrics)
+            results.extend(chunk_results)
+            if on_result:
+                for result in chunk_results:
+                    on_result(result)
+    return results
+
+def primary_document_name(accession_dir: Path) -> Optional[str]:
+    """File name of the primary document according to the accession's full-submission.txt"""
+    try:
+        with open(Path(accession_dir) / FULL_SUBMISSION_NAME, "rb") as f:
+            match = SUBMISSION_FILENAME_PATTERN.search(f.read(SUBMISSION_DOCUMENT_SCAN_BYTES))
+    except OSError:
+        return None
+    return match.group(1).decode("utf-8", "replace") if match else None
+
+def find_filing_documents(filing_dir: Path, include_exhibits: bool = False) -> List[Path]:
+    """
+    HTML documents to parse under filing_dir, one accession directory per filing.
+    By default only each filing's primary document: primary-document.html, else the
+    first document named in full-submission.txt, else a lone HTML file. Accessions
+    where none of these identifies it keep all their HTML files.
+    """
+    filing_dir = Path(filing_dir)
+    documents = []
+    for accession_dir in sorted(p for p in filing_dir.iterdir() if p.is_dir()) if filing_dir.exists() else []:
+        html_files = sorted(f for f in accession_dir.rglob("*") if f.suffix.lower() in (".html", ".htm"))
+        if include_exhibits or len(html_files) <= 1:
+            documents.extend(html_files)
+            continue
+        primary = [f for f in html_files if f.stem == PRIMARY_DOCUMENT_STEM]
+        if not primary:
+            name = primary_document_name(accession_dir)
+            primary = [f for f in html_files if f.name == name]
+        if not primary:
+            _verbose(f"No primary document identified in {accession_dir.name}; parsing all {len(html_files)} files")
+            primary = html_files
+        documents.extend(primary)
+    return documents
+
+def _accession_for(html_file: Path, filing_dir: Path) -> str:
+    """Accession number of a downloaded document (its directory under filing_dir)"""
+    return html_file.relative_to(filing_dir).parts[0]
+
+def download_and_extract_mda(ticker: str, filing_type: str, years_back: int, cik: str = None,
+                             incremental: bool = False, max_workers: Optional[int] = None,
+                             progress_callback: Optional[Callable[[str, dict], None]] = None,
+                             include_full_submission: bool = False, include_exhibits: bool = False):
+    """
+    Download SEC filings and extract MD&A sections for a given ticker.
+    With incremental=True, existing MD&A files are kept and only accessions not
+    yet recorded in the manifest are downloaded and extracted.
+    Only primary documents are downloaded and parsed unless include_full_submission
+    (also save full-submission.txt) or include_exhibits (also parse exhibit HTML) is set.
+    max_workers sets the number of extraction processes (defaults to the CPU count).
+    progress_callback, if given, is called as (stage, details) when the download
+    starts and finishes and after every extracted file.
     Returns: (success_status, number_of_filings, number_of_mda_extracted)
     """
+    report = progress_callback or (lambda stage, details: None)
+
     # Download filings first
-    success, num_downloaded, data_dir = download_edgar_filings(ticker, filing_type, years_back, cik)
+    report("download", {"status": "started"})
+    success, num_downloaded, data_dir = download_edgar_filings(
+        ticker, filing_type, years_back, cik, incremental=incremental,
+        include_full_submission=include_full_submission
+    )
+    report("download", {"status": "finished", "success": success, "filings": num_downloaded})
     
-    if not success or num_downloaded == 0:
+    if not success or (num_downloaded == 0 and not incremental):
         return False, 0, 0
         
     # Set up directories
@@ -191,59 +946,52 @@ def download_and_extract_mda(ticker: str, filing_type: str, years_back: int, cik
     
     print(f"\nMD&A sections will be saved to: {mda_output_dir.absolute()}\n")
     
+    manifest = FilingManifest.load(data_dir / "download_manifest.json") if incremental else None
+
     # Clear existing files to avoid confusion
-    for existing_file in mda_output_dir.glob("*.txt"):
-        existing_file.unlink()
+    if not incremental:
+        for existing_file in mda_output_dir.glob("*.txt"):
+            existing_file.unlink()
     
     # Extract MD&A sections
     mda_count = 0
     
-    # Get all HTML files
-    html_files = list(filing_dir.rglob("*.html"))
-    html_files.extend(list(filing_dir.rglob("*.htm")))
+    # Get the HTML documents to parse: primary documents only, unless exhibits were asked for
+    html_files = find_filing_documents(filing_dir, include_exhibits)
+    if manifest:
+        html_files = [
+            f for f in html_files
+            if not manifest.is_extracted(identifier, filing_type, _accession_for(f, filing_dir))
+        ]
     print(f"Found {len(html_files)} HTML files to process")
     
-    # Process each HTML file
-    for i, html_file in enumerate(html_files, 1):
-        try:
-            print(f"\nProcessing file {i}/{len(html_files)}: {html_file.name}")
-            
-            with open(html_file, 'r', encoding='utf-8', errors='replace') as f:
-                html_content = f.read()
-            
-            # Skip very small files
-            if len(html_content) < 1000:
-                print(f"❌ Skipped: {html_file.name} - File too small")
-                continue
-                
-            # Extract and clean MD&A content
-            mdna_text = extract_item_7_from_html(html_content)
-            clean_mdna_text = clean_text(mdna_text)
-            
-            # Validate content
-            if len(clean_mdna_text) > 1000 and "not found" not in clean_mdna_text.lower():
-                fiscal_year = extract_fiscal_year_from_content(clean_mdna_text, html_file.name)
-                print(f"✅ Found MD&A section for fiscal year {fiscal_year}")
-                
-                output_filename = f"MDNA_{fiscal_year}_{html_file.stem}.txt"
-                output_path = mda_output_dir / output_filename
-                
-                # Save to file
-                with open(output_path, 'w', encoding='utf-8') as out_file:
-                    out_file.write(clean_mdna_text)
-                
-                # Verify the file was created successfully
-                if output_path.exists() and output_path.stat().st_size > 0:
-                    mda_count += 1
-                    print(f"✅ Successfully saved MD&A to: {output_path} ({output_path.stat().st_size} bytes)")
-                else:
-                    print(f"❌ Error: File not written properly to {output_path}")
-            else:
-                print(f"❌ No valid MD&A section found in {html_file.name}")
-                
-        except Exception as e:
-            print(f"❌ Error processing {html_file.name}: {str(e)}")
+    # Extract in parallel and fold the per-file results back into the summary counts
+    done = []
+
+    def on_result(result):
+        done.append(result)
+        report("extract", {"done": len(done), "total": len(html_files),
+                           "file": Path(result["file"]).name, "status": result["status"]})
+
+    report("extract", {"done": 0, "total": len(html_files)})
+    results = extract_mda_files(html_files, mda_output_dir, max_workers=max_workers, on_result=on_result)
+    for result in results:
+        if result["status"] == "extracted":
+            mda_count += 1
+        if manifest and result["status"] in ("extracted", "too_small", "not_found"):
+            output_name = Path(result["output_path"]).name if result["output_path"] else None
+            manifest.mark_extracted(identifier, filing_type, _accession_for(Path(result["file"]), filing_dir), output_name)
     
+    if manifest:
+        manifest.save()
+
+    # Keep the full-text search index in step with this company's MD&A files
+    try:
+        with metrics.timer("search_index"):
+            update_index(mda_output_dir)
+    except sqlite3.Error as e:
+        print(f"Warning: could not update the MD&A search index: {str(e)}")
+
     # Final verification
     actual_files = list(mda_output_dir.glob("*.txt"))
     print(f"\nExtraction Summary:")
@@ -251,11 +999,12 @@ def download_and_extract_mda(ticker: str, filing_type: str, years_back: int, cik
     print(f"- MD&A sections detected and extracted: {mda_count}")
     print(f"- MD&A files actually on disk: {len(actual_files)}")
     
-    if mda_count != len(actual_files):
+    if mda_count != len(actual_files) and not incremental:
         print(f"⚠️ WARNING: Discrepancy between counted extractions ({mda_count}) and actual files ({len(actual_files)})")
         print(f"Files found on disk: {[f.name for f in actual_files]}")
     
     print(f"\n✅ Successfully extracted {len(actual_files)} MD&A sections out of {num_downloaded} filings")
+    export_metrics(run=f"download_and_extract_mda {identifier} {filing_type}")
     return True, num_downloaded, len(actual_files)
 
 # Debug function to help troubleshoot specific files
@@ -277,7 +1026,7 @@ def debug_extraction(file_path):
         print(f"MD&A mentions: {mdna_mentions}")
         
         # Try extraction
-        result = extract_item_7_from_html(content)
+        result = extract_item_7_from_file(file_path)
         clean_result = clean_text(result)
         
         print(f"Extraction result length: {len(clean_result)}")
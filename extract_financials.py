@@ -1,67 +1,228 @@
 import os
 import re
+import numpy as np
 import pandas as pd
 from bs4 import BeautifulSoup
 from pathlib import Path
 import logging
 from typing import List, Dict, Optional
+from filing_cache import get_cached_filing_text
+from metrics import BYTES_BUCKETS, export_metrics, metrics
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Handlers and levels are left to the application
 logger = logging.getLogger(__name__)
 
-def extract_tables_by_title(soup: BeautifulSoup, keywords: List[str]) -> List[pd.DataFrame]:
+# Search patterns for each financial statement
+STATEMENT_PATTERNS = {
+    "balance": ["balance sheet", "financial position", "assets.*liabilities", "statement of financial position"],
+    "income": ["income statement", "statement of operations", "statement of earnings", "profit and loss"],
+    "cashflow": ["cash flow", "cash flows", "statement of cash flows"]
+}
+
+def compile_statement_matcher(statement_patterns: Dict[str, List[str]]) -> re.Pattern:
     """
-    Extracts financial tables from the HTML content based on provided keywords.
-    Returns a list of cleaned DataFrames.
+    Build one regex covering every statement type, with a named group per type.
+    Keywords are matched literally, as plain substrings of the lowercased context.
     """
-    tables = []
-    seen_tables = set()  # To avoid duplicate tables
-    
-    # Find all potential table containers (SEC filings often wrap tables in divs)
-    for container in soup.find_all(['div', 'table']):
-        if container.name == 'table':
-            table = container
-            preceding_text = get_preceding_text(table)
-        else:
-            # Handle cases where tables are inside divs
-            table = container.find('table')
-            if not table:
+    groups = []
+    for statement_type, keywords in statement_patterns.items():
+        alternatives = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+        groups.append(f"(?P<{statement_type}>{alternatives})")
+    return re.compile("|".join(groups))
+
+STATEMENT_MATCHER = compile_statement_matcher(STATEMENT_PATTERNS)
+
+def classify_text(matcher: re.Pattern, text: str) -> List[str]:
+    """Statement types whose keywords appear in text, in matcher group order"""
+    found = {match.lastgroup for match in matcher.finditer(text)}
+    return [name for name in matcher.groupindex if name in found]
+
+def iter_tables_with_context(soup: BeautifulSoup):
+    """
+    Yield (table, preceding_text) once per table in document order.
+    SEC filings often wrap tables in divs, so the context is taken from the
+    outermost div whose first table this is, or from the table itself.
+    """
+    claimed = set()  # divs whose first table has already been seen
+    for table in soup.find_all('table'):
+        owner = table
+        for parent in table.parents:
+            if parent.name != 'div':
                 continue
-            preceding_text = get_preceding_text(container)
-        
-        # Skip if we've already processed this table
-        table_hash = hash(str(table))
-        if table_hash in seen_tables:
+            # Every enclosing div of a claimed div was claimed by the same earlier table
+            if id(parent) in claimed:
+                break
+            claimed.add(id(parent))
+            owner = parent
+        yield table, get_preceding_text(owner)
+
+def extract_statement_tables(soup: BeautifulSoup,
+                             statement_patterns: Dict[str, List[str]] = STATEMENT_PATTERNS) -> Dict[str, List[pd.DataFrame]]:
+    """
+    Extracts financial tables for every statement type in one pass over the document.
+    Each table is classified once against all keyword sets and parsed at most once.
+    Returns a dict of statement type to a list of cleaned DataFrames.
+    """
+    if statement_patterns is STATEMENT_PATTERNS:
+        matcher = STATEMENT_MATCHER
+    else:
+        matcher = compile_statement_matcher(statement_patterns)
+    tables = {statement_type: [] for statement_type in statement_patterns}
+
+    for table, preceding_text in iter_tables_with_context(soup):
+        statement_types = classify_text(matcher, preceding_text.lower())
+        if not statement_types:
             continue
-        seen_tables.add(table_hash)
-        
-        # Check if the preceding text matches our keywords
-        if any(keyword in preceding_text.lower() for keyword in keywords):
-            try:
-                df = pd.read_html(str(table), flavor="bs4")[0]
-                df = clean_table(df)
-                if not df.empty and df.shape[1] > 1:  # Only store meaningful tables
-                    tables.append(df)
-            except Exception as e:
-                logger.warning(f"Failed to parse table: {str(e)}")
-                continue
+        try:
+            df = table_to_dataframe(table)
+        except Exception as e:
+            logger.warning(f"Failed to parse table: {str(e)}")
+            metrics.inc("failures_total", stage="tables", reason="table_parse")
+            continue
+        if not df.empty and df.shape[1] > 1:  # Only store meaningful tables
+            for statement_type in statement_types:
+                tables[statement_type].append(df)
+                metrics.inc("tables_extracted_total", statement_type=statement_type)
     return tables
 
+def extract_tables_by_title(soup: BeautifulSoup, keywords: List[str]) -> List[pd.DataFrame]:
+    """
+    Extracts financial tables from the HTML content based on provided keywords.
+    Returns a list of cleaned DataFrames.
+    """
+    return extract_statement_tables(soup, {"matched": keywords})["matched"]
+
 def get_preceding_text(element) -> str:
     """Get relevant preceding text for context"""
     text_parts = []
+    length = 0
     
     # Look at previous siblings
     prev = element.find_previous_sibling()
-    while prev and len(' '.join(text_parts)) < 500:  # Limit context size
+    while prev and length < 500:  # Limit context size
         if prev.name in ['p', 'div', 'font', 'b', 'strong', 'h1', 'h2', 'h3', 'h4']:
             text = prev.get_text(' ', strip=True)
             if text:
-                text_parts.insert(0, text)
+                text_parts.append(text)
+                length += len(text) + 1
         prev = prev.find_previous_sibling()
     
-    return ' '.join(text_parts)
+    return ' '.join(reversed(text_parts))
+
+# Cells SEC filings use to show a zero amount
+ZERO_MARKERS = {"—", "–", "-", "−", "— —", "--"}
+
+def _expand_rows(table) -> List[tuple]:
+    """
+    Lay a table's rows out on a grid, repeating colspan/rowspan cells into every
+    slot they cover. Returns (is_header, cell_texts) per row; rows of nested
+    tables are left to those tables.
+    """
+    rows = []
+    pending: Dict[int, tuple] = {}  # column -> (text, rows still covered) for open rowspans
+
+    for tr in table.find_all('tr'):
+        if tr.find_parent('table') is not table:
+            continue
+        cells = tr.find_all(['td', 'th'], recursive=False)
+        is_header = bool(cells) and (tr.parent.name == 'thead' or all(c.name == 'th' for c in cells))
+        row: List[Optional[str]] = []
+
+        def fill_pending():
+            while len(row) in pending:
+                col = len(row)
+                text, remaining = pending[col]
+                row.append(text)
+                if remaining > 1:
+                    pending[col] = (text, remaining - 1)
+                else:
+                    del pending[col]
+
+        for cell in cells:
+            fill_pending()
+            text = cell.get_text(' ', strip=True)
+            colspan = _span(cell.get('colspan'))
+            rowspan = _span(cell.get('rowspan'))
+            for _ in range(colspan):
+                if rowspan > 1:
+                    pending[len(row)] = (text, rowspan - 1)
+                row.append(text)
+
+        # Rowspans from earlier rows that extend past this row's own cells
+        for col in sorted(c for c in pending if c >= len(row)):
+            row.extend([None] * (col - len(row)))
+            fill_pending()
+
+        if row:
+            rows.append((is_header, row))
+    return rows
+
+def _span(value) -> int:
+    try:
+        return min(max(int(value), 1), 1000)
+    except (TypeError, ValueError):
+        return 1
+
+def table_to_dataframe(table) -> pd.DataFrame:
+    """
+    Build a cleaned DataFrame straight from an already-parsed <table> node.
+    Header rows are those in <thead> or leading rows made only of <th> cells.
+    All cells are converted in one vectorized pass: `$`, `,` and whitespace are
+    dropped, "(1,234)" becomes -1234, dash cells become 0, and a column is numeric
+    when every non-empty cell in it converted. The original cell strings, aligned
+    with the frame, are kept as a list of rows in df.attrs["cell_text"].
+    """
+    rows = _expand_rows(table)
+    header_count = 0
+    while header_count < len(rows) and rows[header_count][0]:
+        header_count += 1
+    header_rows = [row for _, row in rows[:header_count]]
+    body_rows = [row for _, row in rows[header_count:]]
+    if not body_rows:
+        return pd.DataFrame()
+
+    width = max(len(row) for _, row in rows)
+    grid = np.array([row + [None] * (width - len(row)) for row in body_rows], dtype=object)
+    shape = grid.shape
+
+    text = pd.Series(grid.ravel(), dtype=object).fillna('').astype(str).str.strip()
+    is_zero = text.isin(ZERO_MARKERS)
+    cleaned = text.str.replace(r'[\$,\s]', '', regex=True)
+    # Negatives are written "(1,234)", sometimes with the ")" in its own cell
+    negative = cleaned.str.startswith('(')
+    cleaned = cleaned.str.strip('()')
+    numbers = pd.to_numeric(cleaned, errors='coerce')
+    numbers = numbers.where(~negative, -numbers)
+    numbers[is_zero] = 0.0
+    # Cells holding only "$", ")" or nothing carry no value
+    empty = (cleaned == '') & ~is_zero
+
+    empty_2d = empty.to_numpy().reshape(shape)
+    converted_2d = (numbers.notna() | empty).to_numpy().reshape(shape)
+    numbers_2d = numbers.to_numpy().reshape(shape)
+    text_2d = text.where(~empty).to_numpy().reshape(shape)
+    numeric_columns = converted_2d.all(axis=0) & ~empty_2d.all(axis=0)
+
+    if header_rows:
+        columns = [
+            ' '.join(dict.fromkeys(h[i] for h in header_rows if i < len(h) and h[i])).strip() or str(i)
+            for i in range(width)
+        ]
+    else:
+        columns = [str(i) for i in range(width)]
+
+    df = pd.DataFrame({
+        i: numbers_2d[:, i].astype(float) if numeric_columns[i] else text_2d[:, i]
+        for i in range(width)
+    })
+    # Same as dropna(how='all') on rows then columns, applied to the cell text too
+    keep_rows = df.notna().any(axis=1).to_numpy()
+    keep_columns = df[keep_rows].notna().any(axis=0).to_numpy()
+    df = df.loc[keep_rows, keep_columns]
+    df.columns = [name for name, keep in zip(columns, keep_columns) if keep]
+    cell_text = text_2d[keep_rows][:, keep_columns]
+    df.attrs["cell_text"] = np.where(pd.isna(cell_text), None, cell_text).tolist()
+    return df
 
 def clean_table(df: pd.DataFrame) -> pd.DataFrame:
     """Clean and normalize the extracted table"""
@@ -82,10 +243,17 @@ def clean_table(df: pd.DataFrame) -> pd.DataFrame:
             df[col] = df[col].astype(str).str.replace(r'[\$,]', '', regex=True)
     
     # Convert to numeric where possible
-    df = df.apply(pd.to_numeric, errors='ignore')
+    df = df.apply(_to_numeric_if_possible)
     
     return df
 
+def _to_numeric_if_possible(column: pd.Series) -> pd.Series:
+    """pd.to_numeric(errors='ignore'), which pandas 3 no longer accepts"""
+    try:
+        return pd.to_numeric(column)
+    except (ValueError, TypeError):
+        return column
+
 def save_tables(tables: List[pd.DataFrame], statement_type: str, output_dir: Path, filename_prefix: str):
     """Save extracted tables to CSV files"""
     saved_files = []
@@ -99,51 +267,190 @@ def save_tables(tables: List[pd.DataFrame], statement_type: str, output_dir: Pat
             saved_files.append(output_path)
         except Exception as e:
             logger.error(f"Failed to save {output_path}: {str(e)}")
+            metrics.inc("failures_total", stage="financials", reason="write")
     return saved_files
 
-def extract_financial_statements(input_dir: str, output_dir: str) -> int:
+# Partition columns of the Parquet dataset, outermost first
+PARTITION_COLS = ["company", "form", "year"]
+DATASET_INDEX_NAME = "_index.parquet"  # leading underscore keeps it out of dataset scans
+
+def infer_filing_metadata(html_file: Path) -> Dict[str, str]:
+    """
+    Company, form, year and a source filing id for a document, read from the
+    sec-edgar-filings/<company>/<form>/<accession>/ layout when present.
+    The year is the filing year encoded in the accession number.
+    """
+    parts = html_file.parts
+    metadata = {"company": "unknown", "form": "unknown", "year": "unknown", "source_filing": html_file.stem}
+    if "sec-edgar-filings" in parts:
+        i = parts.index("sec-edgar-filings")
+        layout = parts[i + 1:-1]
+        if len(layout) >= 3:
+            metadata["company"], metadata["form"], accession = layout[:3]
+            metadata["source_filing"] = accession
+    accession_match = re.search(r'\d{10}-(\d{2})-\d{6}', metadata["source_filing"])
+    if accession_match:
+        metadata["year"] = f"20{accession_match.group(1)}"
+    return metadata
+
+def tables_to_long_frame(tables_by_type: Dict[str, List[pd.DataFrame]], source_filing: str) -> pd.DataFrame:
+    """
+    Flatten a filing's statement tables into one long frame with a row per cell:
+    source_filing, statement_type, table_ordinal, row_index, row_label,
+    column_name, value (numeric, NaN if not a number) and text (the cell as
+    written in the filing, from table_to_dataframe; None for empty cells).
+    """
+    frames = []
+    for statement_type, tables in tables_by_type.items():
+        for ordinal, df in enumerate(tables, 1):
+            if df.empty or df.shape[1] < 2:
+                continue
+            values = df.iloc[:, 1:].to_numpy(dtype=object)
+            n_rows, n_cols = values.shape
+            flat = pd.Series(values.ravel(), dtype=object)
+            cell_text = df.attrs.get("cell_text")
+            if cell_text is not None and np.shape(cell_text) == df.shape:
+                text = np.array(cell_text, dtype=object)[:, 1:].ravel()
+            else:
+                # Frames not built by table_to_dataframe: fall back to the values
+                text = flat.where(flat.notna(), None).to_numpy()
+            frames.append(pd.DataFrame({
+                "source_filing": source_filing,
+                "statement_type": statement_type,
+                "table_ordinal": ordinal,
+                "row_index": np.repeat(np.arange(n_rows), n_cols),
+                "row_label": np.repeat(df.iloc[:, 0].astype(str).to_numpy(), n_cols),
+                "column_name": np.tile(np.array([str(c) for c in df.columns[1:]], dtype=object), n_rows),
+                "value": pd.to_numeric(flat, errors="coerce").to_numpy(dtype=float),
+                "text": text,
+            }))
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+def save_tables_parquet(long_frame: pd.DataFrame, dataset_dir: Path, metadata: Dict[str, str]) -> Optional[Path]:
+    """
+    Append one filing's long-format tables to the Parquet dataset partitioned by
+    company/form/year. Files are named after the source filing, so re-running a
+    filing replaces its data instead of duplicating it.
+    """
+    if long_frame.empty:
+        return None
+    frame = long_frame.assign(**{col: metadata[col] for col in PARTITION_COLS})
+    safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', metadata["source_filing"])
+    frame.to_parquet(
+        dataset_dir,
+        partition_cols=PARTITION_COLS,
+        index=False,
+        basename_template=f"{safe_name}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return dataset_dir.joinpath(*(f"{col}={metadata[col]}" for col in PARTITION_COLS))
+
+def update_dataset_index(dataset_dir: Path, entries: List[dict]):
+    """Merge per-filing summary rows into the dataset-level index file"""
+    if not entries:
+        return
+    index_path = dataset_dir / DATASET_INDEX_NAME
+    index = pd.DataFrame(entries)
+    if index_path.exists():
+        index = pd.concat([pd.read_parquet(index_path), index], ignore_index=True)
+    index = index.drop_duplicates(subset=["source_filing", "statement_type"], keep="last")
+    index.to_parquet(index_path, index=False)
+
+def load_financial_dataset(dataset_dir: str, **filters) -> pd.DataFrame:
+    """
+    Load the Parquet dataset in one columnar scan, optionally filtered on
+    partition or metadata columns, e.g. load_financial_dataset(d, company="AAPL").
+    Partition columns are read back as strings, as they were written.
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    partitioning = ds.partitioning(pa.schema([(col, pa.string()) for col in PARTITION_COLS]), flavor="hive")
+    pyarrow_filters = [
+        (col, "==", str(value) if col in PARTITION_COLS else value) for col, value in filters.items()
+    ] or None
+    return pd.read_parquet(dataset_dir, filters=pyarrow_filters, partitioning=partitioning)
+
+def extract_financial_statements(input_dir: str, output_dir: str, output_format: str = "csv") -> int:
     """
     Extract financial statements from HTML files in input_dir and save to output_dir.
+    output_format "csv" writes one CSV per table; "parquet" appends every table to a
+    Parquet dataset in output_dir partitioned by company/form/year, with a
+    dataset-level index in output_dir/_index.parquet.
     Returns the number of files with successfully extracted data.
     """
+    if output_format not in ("csv", "parquet"):
+        raise ValueError(f"Unsupported output format: {output_format}")
+
     input_path = Path(input_dir)
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
     count = 0
     processed_files = 0
+    index_entries = []
     
     for html_file in input_path.glob("*.htm*"):  # Match both .html and .htm
         try:
+            # Skip documents that never mention a statement, when their plain text is already
+            # cached; parsing it just for this check would cost more than the bs4 parse below
+            cached_text = get_cached_filing_text(html_file)
+            if cached_text is not None and not STATEMENT_MATCHER.search(cached_text.lower()):
+                processed_files += 1
+                metrics.inc("files_total", stage="financials", status="no_statements")
+                continue
+            
             with open(html_file, "r", encoding="utf-8", errors="replace") as f:
                 html = f.read()
+            metrics.inc("bytes_read_total", len(html), stage="financials")
+            metrics.observe("filing_bytes", len(html), buckets=BYTES_BUCKETS)
             
-            soup = BeautifulSoup(html, "html.parser")
+            with metrics.timer("parse", parser="bs4"):
+                soup = BeautifulSoup(html, "html.parser")
             filename_prefix = html_file.stem
             
-            # Define search patterns for each financial statement
-            statement_patterns = {
-                "balance": ["balance sheet", "financial position", "assets.*liabilities", "statement of financial position"],
-                "income": ["income statement", "statement of operations", "statement of earnings", "profit and loss"],
-                "cashflow": ["cash flow", "cash flows", "statement of cash flows"]
-            }
-            
             extracted_any = False
+            with metrics.timer("tables"):
+                tables_by_type = extract_statement_tables(soup)
             
-            for statement_type, keywords in statement_patterns.items():
-                tables = extract_tables_by_title(soup, keywords)
-                if tables:
-                    saved_files = save_tables(tables, statement_type, output_path, filename_prefix)
-                    if saved_files:
-                        logger.info(f"Extracted {len(saved_files)} {statement_type} tables from {html_file.name}")
-                        extracted_any = True
+            if output_format == "parquet":
+                metadata = infer_filing_metadata(html_file.resolve())
+                long_frame = tables_to_long_frame(tables_by_type, metadata["source_filing"])
+                with metrics.timer("write", format="parquet"):
+                    saved = save_tables_parquet(long_frame, output_path, metadata)
+                if saved:
+                    logger.info(f"Extracted {len(long_frame)} table cells from {html_file.name}")
+                    extracted_any = True
+                    for statement_type, rows in long_frame.groupby("statement_type"):
+                        index_entries.append({
+                            **metadata,
+                            "statement_type": statement_type,
+                            "table_count": int(rows["table_ordinal"].nunique()),
+                            "cell_count": len(rows),
+                        })
+            else:
+                for statement_type, tables in tables_by_type.items():
+                    if tables:
+                        with metrics.timer("write", format="csv"):
+                            saved_files = save_tables(tables, statement_type, output_path, filename_prefix)
+                        if saved_files:
+                            logger.info(f"Extracted {len(saved_files)} {statement_type} tables from {html_file.name}")
+                            extracted_any = True
             
             if extracted_any:
                 count += 1
             processed_files += 1
+            metrics.inc("files_total", stage="financials", status="extracted" if extracted_any else "no_tables")
             
         except Exception as e:
             logger.error(f"Error processing {html_file.name}: {str(e)}")
+            metrics.inc("failures_total", stage="financials", reason=type(e).__name__)
     
+    if output_format == "parquet":
+        update_dataset_index(output_path, index_entries)
+
     logger.info(f"Processed {processed_files} files, extracted data from {count} files")
+    export_metrics(run=f"extract_financial_statements {input_dir}")
     return count
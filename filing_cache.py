@@ -0,0 +1,154 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+from html_stream import iter_file_chunks, stream_html_text
+from metrics import metrics
+from section_index import SectionRecorder, sections_cache_key
+
+DEFAULT_CACHE_DIR = Path("edgar_data") / "cache"
+DEFAULT_TEXT_CACHE_BYTES = 2 * 1024 ** 3  # 2 GB of compressed text
+
+class DiskCache:
+    """
+    Directory of gzip-compressed entries with an LRU size cap and an optional TTL.
+    Entry mtimes are bumped on every hit, so eviction removes the least recently
+    used entries first. Writes go through a temp file and os.replace, so several
+    processes can share one cache directory.
+    """
+
+    def __init__(self, directory: Union[str, Path], max_bytes: int, ttl: Optional[float] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._size = sum(p.stat().st_size for p in self._entries())
+
+    def _entries(self):
+        return self.directory.glob("*/*.gz")
+
+    def _path(self, key: str) -> Path:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return self.directory / digest[:2] / f"{digest}.gz"
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return the stored bytes for key, or None on a miss or an expired entry"""
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rb") as f:
+                data = f.read()
+                created = f.mtime  # gzip header timestamp, set when the entry was written
+            if self.ttl is not None and created is not None and time.time() - created > self.ttl:
+                self.delete(key)
+                return None
+            os.utime(path)
+            return data
+        except (OSError, EOFError):
+            return None
+
+    def set(self, key: str, data: bytes):
+        """Store bytes under key, evicting least recently used entries if over the cap"""
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb", mtime=time.time()) as f:
+                    f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        self._size += path.stat().st_size
+        if self._size > self.max_bytes:
+            self.evict()
+
+    def get_text(self, key: str) -> Optional[str]:
+        data = self.get(key)
+        return data.decode("utf-8") if data is not None else None
+
+    def set_text(self, key: str, text: str):
+        self.set(key, text.encode("utf-8"))
+
+    def delete(self, key: str):
+        path = self._path(key)
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            self._size -= size
+        except OSError:
+            pass
+
+    def evict(self, target_fraction: float = 0.9):
+        """Delete least recently used entries until the cache is under target_fraction of the cap"""
+        entries = []
+        for p in self._entries():
+            try:
+                stat = p.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, p))
+        entries.sort(key=lambda entry: entry[0])
+
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * target_fraction
+        for _, size, p in entries:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+def file_sha256(path: Union[str, Path]) -> str:
+    """Content hash of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+_text_cache: Optional[DiskCache] = None
+
+def get_text_cache() -> DiskCache:
+    """Process-wide cache of filing text under edgar_data/cache/text"""
+    global _text_cache
+    if _text_cache is None:
+        _text_cache = DiskCache(DEFAULT_CACHE_DIR / "text", DEFAULT_TEXT_CACHE_BYTES)
+    return _text_cache
+
+def get_cached_filing_text(path: Union[str, Path], cache: Optional[DiskCache] = None) -> Optional[str]:
+    """Plain text of a filing document if it is already in the cache, without parsing it"""
+    cache = cache or get_text_cache()
+    text = cache.get_text(file_sha256(path))
+    metrics.inc("cache_requests_total", cache="text", result="miss" if text is None else "hit")
+    return text
+
+def get_filing_text(path: Union[str, Path], cache: Optional[DiskCache] = None) -> str:
+    """
+    Plain text of a filing document, equivalent to clean_text(soup.get_text(" ", strip=True)).
+    Keyed by the hash of its bytes, so identical documents share an entry and
+    edited ones never get stale text. A parse on a miss also stores the offsets of the document's Items under a sibling key (see
+    section_index), so later Item lookups slice this text instead of parsing again.
+    """
+    cache = cache or get_text_cache()
+    key = file_sha256(path)
+    text = cache.get_text(key)
+    metrics.inc("cache_requests_total", cache="text", result="miss" if text is None else "hit")
+    if text is None:
+        recorder = SectionRecorder()
+        with metrics.timer("parse"):
+            stream_html_text(iter_file_chunks(path), recorder)
+            text = recorder.text
+        cache.set_text(key, text)
+        cache.set_text(sections_cache_key(key), json.dumps(recorder.sections(), separators=(",", ":")))
+    return text
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+DATA_DIR = Path("edgar_data")
+
+# Already compressed formats gain nothing from deflate, so they are stored as-is
+STORED_SUFFIXES = {".gz", ".zip", ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".xlsx", ".docx", ".parquet"}
+COPY_BLOCK_SIZE = 1 << 20
+
+def export_sources(identifier: str, filing_type: str, data_dir: Union[str, Path] = DATA_DIR) -> List[Tuple[Path, str]]:
+    """
+    (file, archive name) pairs for one company and form: the downloaded filings and
+    the extracted MD&A sections.
+    """
+    data_dir = Path(data_dir)
+    sources = []
+    for root in (data_dir / "sec-edgar-filings" / identifier / filing_type,
+                 data_dir / "mda_sections" / identifier / filing_type):
+        if not root.exists():
+            continue
+        for path in sorted(root.rglob("*")):
+            if path.is_file():
+                sources.append((path, path.relative_to(data_dir).as_posix()))
+    return sources
+
+def manifest_hash(sources: List[Tuple[Path, str]]) -> str:
+    """Hash of every archive name with its file size and mtime; changes whenever the selection does"""
+    manifest = []
+    for path, arcname in sources:
+        stat = path.stat()
+        manifest.append([arcname, stat.st_size, stat.st_mtime_ns])
+    return hashlib.sha256(json.dumps(manifest).encode("utf-8")).hexdigest()
+
+def _export_prefix(identifier: str, filing_type: str) -> str:
+    return re.sub(r"[^\w.-]", "_", f"{identifier}_{filing_type}") + "_"
+
+def write_zip(sources: List[Tuple[Path, str]], zip_path: Union[str, Path]):
+    """
+    Write sources into a ZIP, copying each file into its entry in blocks so memory
+    use does not depend on file size. Compressed formats are stored, the rest deflated.
+    """
+    with zipfile.ZipFile(zip_path, "w", allowZip64=True) as zf:
+        for path, arcname in sources:
+            compress_type = zipfile.ZIP_STORED if path.suffix.lower() in STORED_SUFFIXES else zipfile.ZIP_DEFLATED
+            info = zipfile.ZipInfo.from_file(path, arcname)
+            info.compress_type = compress_type
+            with open(path, "rb") as src, zf.open(info, "w", force_zip64=True) as dst:
+                shutil.copyfileobj(src, dst, COPY_BLOCK_SIZE)
+
+def build_export(identifier: str, filing_type: str, data_dir: Union[str, Path] = DATA_DIR,
+                 export_dir: Optional[Union[str, Path]] = None) -> Optional[Path]:
+    """
+    ZIP of one company's filings and MD&A sections for a form, cached under
+    edgar_data/exports by manifest hash: an unchanged selection returns the
+    existing archive, a changed one replaces it. Returns None if there is nothing to export.
+    """
+    sources = export_sources(identifier, filing_type, data_dir)
+    if not sources:
+        return None
+
+    export_dir = Path(export_dir) if export_dir else Path(data_dir) / "exports"
+    export_dir.mkdir(parents=True, exist_ok=True)
+    prefix = _export_prefix(identifier, filing_type)
+    zip_path = export_dir / f"{prefix}{manifest_hash(sources)[:16]}.zip"
+    if zip_path.exists():
+        return zip_path
+
+    fd, tmp_path = tempfile.mkstemp(dir=export_dir, suffix=".tmp")
+    os.close(fd)
+    try:
+        write_zip(sources, tmp_path)
+        os.replace(tmp_path, zip_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    # Older archives of the same selection are stale now
+    for old in export_dir.glob(f"{prefix}*.zip"):
+        if old != zip_path and len(old.name) == len(zip_path.name):
+            try:
+                old.unlink()
+            except OSError:
+                pass
+    return zip_path
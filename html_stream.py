@@ -0,0 +1,95 @@
+from html.parser import HTMLParser
+import re
+from pathlib import Path
+from typing import Callable, Iterable, Union
+
+# Size of the pieces an HTML document is fed to the tokenizer in
+CHUNK_SIZE = 1 << 16
+
+# Elements whose content never shows up in get_text()
+SKIP_TAGS = {"script", "style"}
+
+class HTMLTextStream(HTMLParser):
+    """
+    Incremental HTML tokenizer that emits the stripped text of every text node,
+    the same pieces BeautifulSoup's get_text(" ", strip=True) joins together,
+    without ever building a document tree.
+    """
+
+    def __init__(self, on_text: Callable[[str], None]):
+        super().__init__(convert_charrefs=True)
+        self._on_text = on_text
+        self._pending = []
+        self._skip_depth = 0
+
+    def _flush(self):
+        # A text node can reach handle_data in several pieces when it spans chunks
+        if self._pending:
+            text = "".join(self._pending).strip()
+            self._pending = []
+            if text and not self._skip_depth:
+                self._on_text(text)
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        self._pending.append(data)
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_decl(self, decl):
+        self._flush()
+
+    def handle_pi(self, data):
+        self._flush()
+
+    def close(self):
+        super().close()
+        self._flush()
+
+def iter_file_chunks(path: Union[str, Path], chunk_size: int = CHUNK_SIZE):
+    """Yield a text file in fixed-size pieces"""
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+def iter_string_chunks(text: str, chunk_size: int = CHUNK_SIZE):
+    """Yield an in-memory document in fixed-size pieces"""
+    for start in range(0, len(text), chunk_size):
+        yield text[start:start + chunk_size]
+
+def stream_html_text(chunks: Iterable[str], on_text: Callable[[str], None]):
+    """Tokenize HTML chunks once, calling on_text for every non-empty text node"""
+    parser = HTMLTextStream(on_text)
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace (including non-breaking spaces) and drop control characters"""
+    # Replace non-breaking spaces and normalize whitespace
+    text = re.sub(r'\s+', ' ', text.replace('\xa0', ' ')).strip()
+    
+    # Remove control characters
+    text = re.sub(r'[\x00-\x1F\x7F-\x9F]', '', text)
+    
+    return text
+
+def clean_text(text):
+    """Clean and normalize extracted text"""
+    if not text or "not found" in text.lower():
+        return text
+    
+    return normalize_text(text)
@@ -0,0 +1,284 @@
+import hashlib
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import traceback
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from metrics import export_metrics
+
+DATA_DIR = Path("edgar_data")
+JOBS_DB_PATH = DATA_DIR / "jobs.sqlite3"
+WORKER_PID_PATH = DATA_DIR / "job_worker.pid"
+WORKER_LOG_PATH = DATA_DIR / "job_worker.log"
+POLL_INTERVAL = 1.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    dedup_key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress TEXT,
+    result TEXT,
+    error TEXT,
+    worker_pid INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_in_flight ON jobs (dedup_key) WHERE status IN ('queued', 'running');
+"""
+
+def connect(db_path=JOBS_DB_PATH) -> sqlite3.Connection:
+    """Open the job database (WAL, so the app can read while the worker writes)"""
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def job_dedup_key(kind: str, params: dict) -> str:
+    """Jobs with the same kind and parameters share a key"""
+    payload = json.dumps({"kind": kind, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def enqueue_job(kind: str, params: dict, db_path=JOBS_DB_PATH) -> str:
+    """
+    Queue a job and return its id. If an identical job is already queued or
+    running, its id is returned instead, so concurrent users share one run.
+    """
+    key = job_dedup_key(kind, params)
+    conn = connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'running')", (key,)
+        ).fetchone()
+        if row:
+            conn.execute("COMMIT")
+            return row["id"]
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn.execute(
+            "INSERT INTO jobs (id, dedup_key, kind, params, status, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, key, kind, json.dumps(params), now, now),
+        )
+        conn.execute("COMMIT")
+        return job_id
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def _row_to_job(row) -> dict:
+    job = dict(row)
+    for field in ("params", "progress", "result"):
+        job[field] = json.loads(job[field]) if job[field] else None
+    return job
+
+def get_job(job_id: str, db_path=JOBS_DB_PATH) -> Optional[dict]:
+    """Current state of a job, or None if the id is unknown"""
+    conn = connect(db_path)
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+    finally:
+        conn.close()
+
+def claim_next_job(conn: sqlite3.Connection) -> Optional[dict]:
+    """Atomically move the oldest queued job to running and return it"""
+    conn.execute("BEGIN IMMEDIATE")
+    row = conn.execute(
+        "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+    ).fetchone()
+    if row is None:
+        conn.execute("COMMIT")
+        return None
+    conn.execute(
+        "UPDATE jobs SET status = 'running', worker_pid = ?, updated_at = ? WHERE id = ?",
+        (os.getpid(), time.time(), row["id"]),
+    )
+    conn.execute("COMMIT")
+    return _row_to_job(row)
+
+def update_progress(conn: sqlite3.Connection, job_id: str, stage: str, progress: dict):
+    conn.execute(
+        "UPDATE jobs SET stage = ?, progress = ?, updated_at = ? WHERE id = ?",
+        (stage, json.dumps(progress), time.time(), job_id),
+    )
+
+def finish_job(conn: sqlite3.Connection, job_id: str, result: Optional[dict] = None, error: Optional[str] = None):
+    conn.execute(
+        "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+        ("failed" if error else "done", json.dumps(result) if result is not None else None,
+         error, time.time(), job_id),
+    )
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def requeue_orphaned_jobs(conn: sqlite3.Connection) -> int:
+    """Put running jobs whose worker process is gone back in the queue"""
+    rows = conn.execute("SELECT id, worker_pid FROM jobs WHERE status = 'running'").fetchall()
+    orphaned = [row["id"] for row in rows if not _pid_alive(row["worker_pid"])]
+    for job_id in orphaned:
+        conn.execute(
+            "UPDATE jobs SET status = 'queued', worker_pid = NULL, updated_at = ? WHERE id = ?",
+            (time.time(), job_id),
+        )
+    return len(orphaned)
+
+def _read_combined_mda(mda_files) -> str:
+    """All MD&A files in one text, separated by the --- FROM FILE markers the analyzer understands"""
+    combined_text = ""
+    for file_path in mda_files:
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                combined_text += f"\n\n--- FROM FILE: {Path(file_path).name} ---\n\n"
+                combined_text += f.read()
+        except Exception as e:
+            print(f"Error reading {Path(file_path).name}: {str(e)}")
+    return combined_text
+
+def run_download_and_analyze(params: dict, report) -> dict:
+    """
+    The work behind the app's "Download & Analyze Filings" button: download and
+    extract, build the ZIP export, then analyze. report(stage, details) records progress.
+    """
+    from edgar_downloader import download_and_extract_mda
+    from filing_export import build_export
+    from mda_analyzer_gemini import analyze_mda_trend, analyze_mda_with_gemini, load_gemini_api_key
+
+    identifier = params["identifier"]
+    filing_type = params["filing_type"]
+    ticker, cik = (None, identifier) if identifier.isdigit() else (identifier, None)
+
+    success, count, mda_count = download_and_extract_mda(
+        ticker=ticker, cik=cik, filing_type=filing_type, years_back=params["years_back"],
+        incremental=params.get("incremental", False), progress_callback=report,
+        include_full_submission=params.get("include_full_submission", False),
+        include_exhibits=params.get("include_exhibits", False),
+    )
+    result = {"success": success, "count": count, "mda_count": mda_count, "mda_files": [],
+              "zip_path": None, "analysis": None}
+    if not (success and (count > 0 or mda_count > 0)):
+        return result
+
+    mda_dir = DATA_DIR / "mda_sections" / identifier / filing_type
+    mda_files = sorted(mda_dir.glob("*.txt")) if mda_dir.exists() else []
+    result["mda_files"] = [str(f) for f in mda_files]
+
+    # ZIP of this company's filings and MD&A only, reused while they are unchanged
+    report("export", {"status": "started"})
+    zip_path = build_export(identifier, filing_type, DATA_DIR)
+    result["zip_path"] = str(zip_path.absolute()) if zip_path else None
+
+    if not load_gemini_api_key():
+        result["analysis"] = "❌ Gemini API key not found. Please create a 'gemini_api_key.txt' file in your app folder."
+        return result
+
+    analyzed = []
+
+    def on_analysis(name):
+        analyzed.append(name)
+        report("analyze", {"done": len(analyzed), "total": len(mda_files), "file": name})
+
+    report("analyze", {"done": 0, "total": len(mda_files)})
+    if params.get("analysis_mode") == "per_filing":
+        # Analyze each filing once (cached) and merge into a trend report
+        result["analysis"] = analyze_mda_trend(mda_files, "comprehensive", on_analysis=on_analysis)
+    else:
+        result["analysis"] = analyze_mda_with_gemini(_read_combined_mda(mda_files), "comprehensive")
+    return result
+
+# Job kind -> function(params, report) -> JSON-serializable result
+JOB_HANDLERS = {
+    "download_and_analyze": run_download_and_analyze,
+}
+
+def run_job(conn: sqlite3.Connection, job: dict):
+    """Run one claimed job, recording progress and the final result or error"""
+    handler = JOB_HANDLERS.get(job["kind"])
+    if handler is None:
+        finish_job(conn, job["id"], error=f"Unknown job kind: {job['kind']}")
+        return
+
+    # Progress can be reported from the analyzer's worker threads
+    lock = threading.Lock()
+
+    def report(stage, details):
+        with lock:
+            update_progress(conn, job["id"], stage, details)
+
+    try:
+        finish_job(conn, job["id"], result=handler(job["params"], report))
+    except Exception as e:
+        traceback.print_exc()
+        finish_job(conn, job["id"], error=str(e))
+    finally:
+        export_metrics(run=f"job {job['id']} {job['kind']}")
+
+def run_worker(db_path=JOBS_DB_PATH, poll_interval: float = POLL_INTERVAL, once: bool = False):
+    """Worker loop: claim and run queued jobs one at a time (once=True stops when the queue is empty)"""
+    conn = connect(db_path)
+    requeued = requeue_orphaned_jobs(conn)
+    if requeued:
+        print(f"Requeued {requeued} jobs left running by a dead worker")
+    try:
+        while True:
+            job = claim_next_job(conn)
+            if job is None:
+                if once:
+                    return
+                time.sleep(poll_interval)
+                continue
+            print(f"Running job {job['id']} ({job['kind']}): {job['params']}")
+            run_job(conn, job)
+    finally:
+        conn.close()
+
+def worker_running() -> bool:
+    try:
+        return _pid_alive(int(WORKER_PID_PATH.read_text().strip()))
+    except (OSError, ValueError):
+        return False
+
+def ensure_worker() -> bool:
+    """Start a detached worker process unless one is already running; returns True if one was started"""
+    if worker_running():
+        return False
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    with open(WORKER_LOG_PATH, "a") as log:
+        process = subprocess.Popen(
+            [sys.executable, "-u", str(Path(__file__).absolute())],
+            stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+    WORKER_PID_PATH.write_text(str(process.pid))
+    return True
+
+if __name__ == "__main__":
+    WORKER_PID_PATH.parent.mkdir(parents=True, exist_ok=True)
+    WORKER_PID_PATH.write_text(str(os.getpid()))
+    run_worker()
@@ -1,7 +1,74 @@
+import hashlib
 import os
-import google.generativeai as genai
-import streamlit as st
+import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from filing_cache import DEFAULT_CACHE_DIR, DiskCache
+from mda_compaction import FILE_MARKER_PATTERN, SENTENCE_BOUNDARY_PATTERN, compact_mda_text, count_tokens
+from metrics import TOKENS_BUCKETS, metrics
+
+FAST_MODEL = "gemini-1.5-flash"  # Faster for shorter texts
+LONG_CONTEXT_MODEL = "gemini-1.5-pro"  # For very long texts
+LONG_TEXT_TOKEN_THRESHOLD = 25000
+
+# Texts over this many tokens (after compaction) are analyzed with map-reduce instead of one request
+MAP_REDUCE_TOKEN_THRESHOLD = 50000
+DEFAULT_CHUNK_SIZE = 60000
+# Condense rounds before the notes are reduced as they are (cut to MAP_REDUCE_TOKEN_THRESHOLD if needed)
+DEFAULT_MAX_ROUNDS = 3
+DEFAULT_CONCURRENCY = 4
+
+# Analysis types build_prompt has dedicated templates for
+ANALYSIS_TYPES = ["comprehensive", "revenue", "profitability", "risks"]
+
+# Bump whenever build_prompt or build_chunk_prompt change, so cached analyses are not reused
+PROMPT_VERSION = 1
+
+ANALYSIS_CACHE_DIR = DEFAULT_CACHE_DIR / "analyses"
+ANALYSIS_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+_analysis_cache = None
+
+def get_analysis_cache():
+    """Persistent cache of finished analyses under edgar_data/cache/analyses"""
+    global _analysis_cache
+    if _analysis_cache is None:
+        _analysis_cache = DiskCache(ANALYSIS_CACHE_DIR, ANALYSIS_CACHE_MAX_BYTES)
+    return _analysis_cache
+
+def client_cache_identity(client):
+    """
+    Name of the client behind an analysis for its cache key: empty for the default
+    Gemini client, else the client's cache_identity or class, so a fake or stub
+    client never fills the cache with answers the real model did not give.
+    """
+    if client is None:
+        return ""
+    identity = getattr(client, "cache_identity", None)
+    if identity is not None:
+        return identity
+    return f"{type(client).__module__}.{type(client).__qualname__}"
+
+def analysis_cache_key(mda_text, analysis_type, model, client=None):
+    """Cache key for one analysis: content hash, prompt version, analysis type, model and client"""
+    digest = hashlib.sha256(mda_text.encode("utf-8")).hexdigest()
+    identity = client_cache_identity(client)
+    if identity:
+        model = f"{model}@{identity}"
+    return f"v{PROMPT_VERSION}:{analysis_type}:{model}:{digest}"
+
+def _cached_analysis(key, compute, use_cache):
+    """Return a cached analysis for key, or compute and store it; failures are never cached"""
+    cache = get_analysis_cache() if use_cache else None
+    if cache is not None:
+        cached = cache.get_text(key)
+        metrics.inc("cache_requests_total", cache="analysis", result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+    result = compute()
+    if cache is not None and not result.startswith("❌"):
+        cache.set_text(key, result)
+    return result
 
 def build_prompt(mda_text, analysis_type):
     """Build a prompt for the Gemini model based on analysis type."""
@@ -73,51 +140,304 @@ Return in markdown format with clear headings and bullet points where appropriat
     else:
         return f"Analyze this MD&A section:\n\n{mda_text}"
 
+API_KEY_PATH = Path("gemini_api_key.txt")
+
+_api_key = (None, None)  # (file mtime, key)
+_clients = {}
+
 def load_gemini_api_key():
-    """Load Gemini API key from file."""
+    """Load Gemini API key from file (read again only after the file changes)."""
+    global _api_key
     try:
-        with open("gemini_api_key.txt", "r") as f:
-            return f.read().strip()
+        mtime = API_KEY_PATH.stat().st_mtime_ns
+        if _api_key[0] != mtime:
+            with open(API_KEY_PATH, "r") as f:
+                _api_key = (mtime, f.read().strip())
+        return _api_key[1]
     except FileNotFoundError:
         return None
 
-def analyze_mda_with_gemini(mda_text, analysis_type="comprehensive"):
-    """Analyze MD&A text using Gemini API with specified analysis type."""
+class ModelClient:
+    """Interface the analyzers use to talk to a language model; swap in a fake for tests"""
+
+    def generate(self, prompt, model):
+        """Return the model's text response to prompt"""
+        raise NotImplementedError
+
+class GeminiClient(ModelClient):
+    """ModelClient backed by the Google Gemini API"""
+
+    cache_identity = ""  # the default client; keeps the cache keys analyses were stored under
+
+    def __init__(self, api_key):
+        # Imported here: google.generativeai takes over a second to import
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self._models = {}
+
+    def generate(self, prompt, model):
+        if model not in self._models:
+            self._models[model] = self._genai.GenerativeModel(model)
+        metrics.observe("prompt_tokens", count_tokens(prompt), buckets=TOKENS_BUCKETS, model=model)
+        with metrics.timer("model_call", model=model):
+            try:
+                response = self._models[model].generate_content(prompt)
+                text = response.text
+            except Exception as e:
+                metrics.inc("failures_total", stage="model_call", reason=type(e).__name__)
+                raise
+        metrics.inc("model_calls_total", model=model)
+        return text
+
+def get_model_client():
+    """Gemini client for the key in gemini_api_key.txt, or None if there is no key; one client per key"""
     api_key = load_gemini_api_key()
     if not api_key:
+        return None
+    if api_key not in _clients:
+        _clients[api_key] = GeminiClient(api_key)
+    return _clients[api_key]
+
+def select_model(mda_text):
+    """Pick the model based on the token count of the text"""
+    return LONG_CONTEXT_MODEL if count_tokens(mda_text) > LONG_TEXT_TOKEN_THRESHOLD else FAST_MODEL
+
+def split_into_chunks(text, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Split text into chunks of at most chunk_size characters. File boundaries come
+    first; longer sections are split between sentences, and only a single
+    sentence longer than chunk_size is cut mid-sentence.
+    """
+    chunks = []
+    for section in FILE_MARKER_PATTERN.split(text):
+        section = section.strip()
+        if not section:
+            continue
+        if len(section) <= chunk_size:
+            chunks.append(section)
+            continue
+
+        current = []
+        current_len = 0
+        for sentence in SENTENCE_BOUNDARY_PATTERN.split(section):
+            while len(sentence) > chunk_size:
+                chunks.append(sentence[:chunk_size])
+                sentence = sentence[chunk_size:]
+            if current_len + len(sentence) + 1 > chunk_size and current:
+                chunks.append(" ".join(current))
+                current, current_len = [], 0
+            current.append(sentence)
+            current_len += len(sentence) + 1
+        if current:
+            chunks.append(" ".join(current))
+    return chunks
+
+def build_chunk_prompt(chunk, analysis_type, index, total):
+    """Prompt for the map step: condense one chunk into notes for the final analysis"""
+    return f"""You are preparing notes for a {analysis_type} analysis of a company's MD&A.
+This is part {index} of {total}. Extract every fact relevant to that analysis:
+figures with their periods, trends, drivers, risks, liquidity and outlook statements.
+Keep numbers exact, drop boilerplate, and do not draw conclusions beyond this part.
+
+{chunk}
+
+Return concise markdown bullet points.
+"""
+
+def analyze_mda_map_reduce(mda_text, analysis_type="comprehensive", chunk_size=DEFAULT_CHUNK_SIZE,
+                           concurrency=DEFAULT_CONCURRENCY, model=FAST_MODEL, reduce_model=None, client=None,
+                           use_cache=True, max_rounds=DEFAULT_MAX_ROUNDS):
+    """
+    Analyze arbitrarily long MD&A text without truncation: split it on section
+    boundaries, condense the chunks concurrently (at most `concurrency` requests
+    in flight), then reduce the notes into the final report with build_prompt.
+    Notes that are still too long are condensed again, for at most max_rounds
+    rounds and only while they keep shrinking; notes still over
+    MAP_REDUCE_TOKEN_THRESHOLD tokens after that are cut to fit.
+    """
+    cache_model = f"map-reduce:{model}:{reduce_model or 'auto'}:{chunk_size}"
+    return _cached_analysis(
+        analysis_cache_key(mda_text, analysis_type, cache_model, client),
+        lambda: _run_map_reduce(mda_text, analysis_type, chunk_size, concurrency, model, reduce_model, client,
+                                max_rounds),
+        use_cache,
+    )
+
+def _truncate_to_tokens(text, max_tokens, chunk_size):
+    """Leading chunks of text that fit in max_tokens"""
+    kept = []
+    tokens = 0
+    for chunk in split_into_chunks(text, chunk_size):
+        tokens += count_tokens(chunk)
+        if tokens > max_tokens and kept:
+            break
+        kept.append(chunk)
+    return "\n\n".join(kept)
+
+def _run_map_reduce(mda_text, analysis_type, chunk_size, concurrency, model, reduce_model, client,
+                    max_rounds=DEFAULT_MAX_ROUNDS):
+    client = client or get_model_client()
+    if client is None:
+        return "❌ Gemini API key not found. Please create a 'gemini_api_key.txt' file in your app folder."
+
+    try:
+        notes = mda_text
+        for _ in range(max(1, max_rounds)):
+            chunks = split_into_chunks(notes, chunk_size)
+            if len(chunks) <= 1:
+                break
+            prompts = [build_chunk_prompt(chunk, analysis_type, i, len(chunks)) for i, chunk in enumerate(chunks, 1)]
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+                summaries = list(executor.map(lambda prompt: client.generate(prompt, model), prompts))
+            condensed = "\n\n".join(summaries)
+            shrank = len(condensed) < len(notes)
+            notes = condensed
+            if len(notes) <= chunk_size or not shrank:
+                break
+
+        if count_tokens(notes) > MAP_REDUCE_TOKEN_THRESHOLD:
+            notes = _truncate_to_tokens(notes, MAP_REDUCE_TOKEN_THRESHOLD, chunk_size)
+        final_model = reduce_model or select_model(notes)
+        return client.generate(build_prompt(notes, analysis_type), final_model)
+    except Exception as e:
+        return f"❌ Gemini Analysis failed: {str(e)}"
+
+def analyze_mda_with_gemini(mda_text, analysis_type="comprehensive", client=None,
+                            chunk_size=DEFAULT_CHUNK_SIZE, concurrency=DEFAULT_CONCURRENCY, use_cache=True,
+                            compact=True):
+    """
+    Analyze MD&A text using Gemini API with specified analysis type.
+    The text is first compacted with compact_mda_text; the model is chosen from
+    the compacted token count, and texts over MAP_REDUCE_TOKEN_THRESHOLD tokens
+    go through analyze_mda_map_reduce.
+    Results are cached on disk, so repeating an identical analysis is free.
+    """
+    if compact:
+        with metrics.timer("compact"):
+            compaction = compact_mda_text(mda_text)
+        metrics.inc("tokens_removed_total", compaction.original_tokens - compaction.compacted_tokens)
+        mda_text = compaction.text
+    tokens = count_tokens(mda_text)
+
+    if tokens > MAP_REDUCE_TOKEN_THRESHOLD:
+        return analyze_mda_map_reduce(mda_text, analysis_type, chunk_size=chunk_size,
+                                      concurrency=concurrency, client=client, use_cache=use_cache)
+
+    model = LONG_CONTEXT_MODEL if tokens > LONG_TEXT_TOKEN_THRESHOLD else FAST_MODEL
+    return _cached_analysis(
+        analysis_cache_key(mda_text, analysis_type, model, client),
+        lambda: _run_single_analysis(mda_text, analysis_type, model, client),
+        use_cache,
+    )
+
+def _run_single_analysis(mda_text, analysis_type, model, client):
+    client = client or get_model_client()
+    if client is None:
         return "❌ Gemini API key not found. Please create a 'gemini_api_key.txt' file in your app folder."
 
-    genai.configure(api_key=api_key)
-    
-    # Select appropriate model based on text length
-    if len(mda_text) > 100000:
-        model = genai.GenerativeModel("gemini-1.5-pro")  # For very long texts
-    else:
-        model = genai.GenerativeModel("gemini-1.5-flash")  # Faster for shorter texts
-    
     prompt = build_prompt(mda_text, analysis_type)
 
     try:
-        # Break very long texts into chunks if needed
-        if len(mda_text) > 200000:
-            # This is a simplified approach - a more robust implementation would 
-            # need to handle segmentation at appropriate breaks
-            st.warning("Text is very long - analysis may be limited or incomplete.")
-            mda_text = mda_text[:190000] + "\n\n[Content truncated due to length...]"
-            prompt = build_prompt(mda_text, analysis_type)
-        
-        response = model.generate_content(prompt)
-        return response.text
+        return client.generate(prompt, model)
     except Exception as e:
         return f"❌ Gemini Analysis failed: {str(e)}"
 
+# MD&A files are saved as MDNA_{fiscal year}_{accession}_{source document}.txt
+MDA_FILENAME_PATTERN = re.compile(r"^MDNA_(\d{4}|unknown_year)_")
+
+def fiscal_year_of(file_path):
+    """Fiscal year encoded in an MD&A file name, or unknown_year"""
+    match = MDA_FILENAME_PATTERN.match(Path(file_path).name)
+    return match.group(1) if match else "unknown_year"
+
+def build_trend_prompt(per_filing_analyses, analysis_type):
+    """Prompt for merging per-filing analyses (oldest first) into one trend report"""
+    sections = "\n\n".join(
+        f"### Fiscal year {year} ({name})\n\n{analysis}" for year, name, analysis in per_filing_analyses
+    )
+    return f"""Below are separate {analysis_type} analyses of a company's MD&A sections, one per filing, oldest first:
+
+{sections}
+
+Write a year-over-year trend report based only on these analyses:
+1. How the key metrics and drivers changed from each year to the next
+2. Trends that persist across years, and any reversals
+3. Risks that emerged, grew or faded over time
+4. What the latest filing changes compared to the previous ones
+5. Overall trajectory of the company's financial health
+
+Format as a markdown report with clear headings and bullet points where appropriate.
+"""
+
+def analyze_filings_per_year(files, analysis_type="comprehensive", client=None, concurrency=DEFAULT_CONCURRENCY,
+                             on_analysis=None):
+    """
+    Analyze each MD&A file on its own, oldest first. Every analysis goes through the
+    analysis cache, so a file is only ever sent to the model once; adding a new
+    filing costs one new analysis. on_analysis, if given, is called with each file
+    name as its analysis finishes. Returns a list of (fiscal year, file name, analysis).
+    """
+    files = sorted(files, key=lambda f: (fiscal_year_of(f), Path(f).name))
+    client = client or get_model_client()
+
+    # Each file is compacted on its own, so its text (and cache key) does not
+    # depend on which other filings are in the window
+    texts = [read_file_content(f) for f in files]
+
+    def analyze(item):
+        file_path, text = item
+        if text.startswith(READ_ERROR_PREFIX):
+            # Never send (or cache) the error message as if it were the filing
+            analysis = f"❌ Could not read {Path(file_path).name}: {text[len(READ_ERROR_PREFIX):]}"
+        else:
+            analysis = analyze_mda_with_gemini(text, analysis_type, client=client)
+        if on_analysis:
+            on_analysis(Path(file_path).name)
+        return analysis
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        analyses = list(executor.map(analyze, zip(files, texts)))
+    return [(fiscal_year_of(f), Path(f).name, analysis) for f, analysis in zip(files, analyses)]
+
+def analyze_mda_trend(files, analysis_type="comprehensive", client=None, concurrency=DEFAULT_CONCURRENCY,
+                      model=FAST_MODEL, use_cache=True, on_analysis=None):
+    """
+    Incremental alternative to analyzing all MD&A text at once: analyze each
+    filing separately (cached), then combine the stored analyses into a
+    year-over-year trend report with one cheap merge call.
+    """
+    per_filing = analyze_filings_per_year(files, analysis_type, client=client, concurrency=concurrency,
+                                          on_analysis=on_analysis)
+    failed = [name for _, name, analysis in per_filing if analysis.startswith("❌")]
+    if failed:
+        return f"❌ Analysis failed for: {', '.join(failed)}"
+    if len(per_filing) == 1:
+        return per_filing[0][2]
+
+    prompt = build_trend_prompt(per_filing, analysis_type)
+
+    def merge():
+        merge_client = client or get_model_client()
+        if merge_client is None:
+            return "❌ Gemini API key not found. Please create a 'gemini_api_key.txt' file in your app folder."
+        try:
+            return merge_client.generate(prompt, model)
+        except Exception as e:
+            return f"❌ Gemini Analysis failed: {str(e)}"
+
+    return _cached_analysis(analysis_cache_key(prompt, f"trend-{analysis_type}", model, client), merge, use_cache)
+
+READ_ERROR_PREFIX = "Error reading file: "
+
 def read_file_content(file_path):
     """Read content from a single file."""
     try:
         with open(file_path, "r", encoding="utf-8") as f:
             return f.read()
     except Exception as e:
-        return f"Error reading file: {str(e)}"
+        return f"{READ_ERROR_PREFIX}{str(e)}"
 
 def get_available_mda_files(company_identifier=None, filing_type=None):
     """Get available MD&A files for a specific company and filing type."""
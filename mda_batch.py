@@ -0,0 +1,171 @@
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from mda_analyzer_gemini import (
+    ANALYSIS_TYPES,
+    ModelClient,
+    analyze_mda_with_gemini,
+    client_cache_identity,
+    get_available_mda_files,
+    get_model_client,
+)
+from mda_compaction import compact_mda_text, count_tokens
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_REQUESTS_PER_MINUTE = 60
+DEFAULT_TOKENS_PER_MINUTE = 1_000_000
+
+@dataclass
+class AnalysisJob:
+    """One (company, MD&A file, analysis type) analysis to run"""
+    identifier: str
+    file: str
+    analysis_type: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.identifier}|{self.file}|{self.analysis_type}"
+
+class AsyncRateLimiter:
+    """
+    Sliding one-minute window on both requests and tokens. A request waits until
+    starting it keeps both totals for the last 60 seconds within their limits; a
+    single request larger than the token limit is let through on an empty window.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._events = deque()  # (timestamp, tokens)
+        self._tokens_in_window = 0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int):
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                while self._events and now - self._events[0][0] >= 60:
+                    _, old_tokens = self._events.popleft()
+                    self._tokens_in_window -= old_tokens
+                fits = (len(self._events) < self.requests_per_minute
+                        and self._tokens_in_window + tokens <= self.tokens_per_minute)
+                if fits or not self._events:
+                    self._events.append((now, tokens))
+                    self._tokens_in_window += tokens
+                    return
+                wait = 60 - (now - self._events[0][0])
+            await asyncio.sleep(max(wait, 0.01))
+
+class RateLimitedClient(ModelClient):
+    """
+    ModelClient that waits on an AsyncRateLimiter before every generate() call, so
+    each map-reduce request counts and cached analyses (no call) cost nothing.
+    generate() runs in worker threads and waits on the limiter in the event loop.
+    """
+
+    def __init__(self, client: ModelClient, limiter: AsyncRateLimiter, loop: asyncio.AbstractEventLoop):
+        self.client = client
+        self.limiter = limiter
+        self.loop = loop
+
+    @property
+    def cache_identity(self):
+        return client_cache_identity(self.client)
+
+    def generate(self, prompt, model):
+        asyncio.run_coroutine_threadsafe(self.limiter.acquire(count_tokens(prompt)), self.loop).result()
+        return self.client.generate(prompt, model)
+
+def load_completed_keys(sink_path: Path) -> set:
+    """Keys of jobs already finished successfully in a JSONL sink (a torn last line is ignored)"""
+    completed = set()
+    if not sink_path.exists():
+        return completed
+    with open(sink_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["key"])
+    return completed
+
+def jobs_from_available_files(analysis_types: Iterable[str] = ANALYSIS_TYPES, company_identifier: Optional[str] = None,
+                              filing_type: Optional[str] = None) -> List[AnalysisJob]:
+    """One job per MD&A file found by get_available_mda_files and per analysis type"""
+    jobs = []
+    for path in sorted(get_available_mda_files(company_identifier, filing_type)):
+        # edgar_data/mda_sections/<identifier>/<filing type>/<file>
+        identifier = path.parts[-3] if len(path.parts) >= 3 else "unknown"
+        for analysis_type in analysis_types:
+            jobs.append(AnalysisJob(identifier, str(path), analysis_type))
+    return jobs
+
+async def run_batch_analysis(jobs: List[AnalysisJob], sink_path, concurrency: int = DEFAULT_CONCURRENCY,
+                             requests_per_minute: int = DEFAULT_REQUESTS_PER_MINUTE,
+                             tokens_per_minute: int = DEFAULT_TOKENS_PER_MINUTE, client=None) -> dict:
+    """
+    Run many analyses with at most `concurrency` in flight, within the request and
+    token per-minute limits, which apply to every model call (map-reduce jobs make
+    several) and not to cache hits. Each result is appended to the JSONL sink as soon as
+    it finishes, so a crashed run resumes by skipping jobs already recorded as ok.
+    Returns counts of ok, failed and skipped jobs.
+    """
+    sink_path = Path(sink_path)
+    sink_path.parent.mkdir(parents=True, exist_ok=True)
+    completed = load_completed_keys(sink_path)
+    pending = [job for job in jobs if job.key not in completed]
+    client = client or get_model_client()
+
+    limiter = AsyncRateLimiter(requests_per_minute, tokens_per_minute)
+    if client is not None:
+        client = RateLimitedClient(client, limiter, asyncio.get_running_loop())
+    semaphore = asyncio.Semaphore(concurrency)
+    write_lock = asyncio.Lock()
+    counts = {"ok": 0, "error": 0, "skipped": len(jobs) - len(pending)}
+
+    with open(sink_path, "a", encoding="utf-8") as sink:
+
+        async def write(record: dict):
+            async with write_lock:
+                sink.write(json.dumps(record) + "\n")
+                sink.flush()
+                os.fsync(sink.fileno())
+
+        async def run(job: AnalysisJob):
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    text = await asyncio.to_thread(Path(job.file).read_text, encoding="utf-8")
+                    text = (await asyncio.to_thread(compact_mda_text, text)).text
+                    result = await asyncio.to_thread(analyze_mda_with_gemini, text, job.analysis_type, client,
+                                                     compact=False)
+                    status = "error" if result.startswith("❌") else "ok"
+                except Exception as e:
+                    result, status = f"❌ {str(e)}", "error"
+                counts[status] += 1
+                await write({
+                    "key": job.key,
+                    "identifier": job.identifier,
+                    "file": job.file,
+                    "analysis_type": job.analysis_type,
+                    "status": status,
+                    "result": result,
+                    "elapsed": round(time.monotonic() - started, 3),
+                    "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                })
+
+        await asyncio.gather(*(run(job) for job in pending))
+
+    return counts
+
+def run_batch_analysis_sync(jobs: List[AnalysisJob], sink_path, **kwargs) -> dict:
+    """Blocking wrapper around run_batch_analysis for scripts and cron jobs"""
+    return asyncio.run(run_batch_analysis(jobs, sink_path, **kwargs))
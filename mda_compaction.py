@@ -0,0 +1,123 @@
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Optional, Set
+
+# Boundaries app.py puts between files when combining MD&A sections
+FILE_MARKER_PATTERN = re.compile(r"\n*--- FROM FILE: .*? ---\n*")
+SENTENCE_BOUNDARY_PATTERN = re.compile(r"(?<=[.!?])\s+(?=[A-Z(\"'])")
+
+# Approximate tokenizer: words, numbers and single punctuation marks
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Sentences of the forward-looking-statements disclaimer (not the outlook itself)
+BOILERPLATE_PATTERN = re.compile(
+    r"Private Securities Litigation Reform Act|safe harbor|undue reliance|"
+    r"undertakes? no obligation|assumes? no obligation|"
+    r"identified by (?:the use of )?(?:forward-looking )?(?:words|terminology) such as|"
+    r"should be read in conjunction with the (?:consolidated )?financial statements",
+    re.IGNORECASE,
+)
+# "Factors that could cause actual results to differ materially ..." sentences are
+# only disclaimers when they do not go on to name the factors
+RISK_DISCLAIMER_PATTERN = re.compile(r"could cause (?:actual|our) results to differ materially", re.IGNORECASE)
+RISK_DRIVER_LIST_PATTERN = re.compile(r"\binclud(?:e|es|ing)\b|\bsuch as\b|\bamong others\b|[:;]", re.IGNORECASE)
+# Running page headers/footers and navigation links left by get_text
+PAGE_ARTIFACT_PATTERN = re.compile(
+    r"[^|.]{0,80}\|\s*(?:20\d{2}\s+)?Form\s+10-[KQ]\s*\|\s*\d{1,3}|\bTable of Contents\b",
+    re.IGNORECASE,
+)
+NUMERIC_TOKEN_PATTERN = re.compile(r"^[\$(]*-?[\d,.]+%?\)?$|^[—–-]$")
+
+DEFAULT_MIN_DEDUPE_LENGTH = 80
+DEFAULT_MAX_NUMERIC_RUN = 24
+
+@dataclass
+class CompactionResult:
+    """Compacted text plus before/after token counts"""
+    text: str
+    original_tokens: int
+    compacted_tokens: int
+    removed_sentences: int
+
+def count_tokens(text: str) -> int:
+    """
+    Estimate the model token count of text. Long words split into several
+    tokens, so each word counts one token per four characters.
+    """
+    return sum((len(token) + 3) // 4 for token in TOKEN_PATTERN.findall(text))
+
+def _sentence_fingerprint(sentence: str) -> bytes:
+    """Hash of a sentence with whitespace normalized; only exact repeats collide"""
+    normalized = " ".join(sentence.split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+
+def _collapse_numeric_runs(sentence: str, max_run: int) -> str:
+    """Shorten runs of more than max_run consecutive figures (flattened tables)"""
+    words = sentence.split(" ")
+    out = []
+    run = []
+    for word in words + [None]:
+        if word is not None and NUMERIC_TOKEN_PATTERN.match(word):
+            run.append(word)
+            continue
+        if len(run) > max_run:
+            out.extend(run[:max_run])
+            out.append(f"[{len(run) - max_run} more figures omitted]")
+        else:
+            out.extend(run)
+        run = []
+        if word is not None:
+            out.append(word)
+    return " ".join(out)
+
+def compact_section(text: str, seen: Set[bytes], min_dedupe_length: int = DEFAULT_MIN_DEDUPE_LENGTH,
+                    max_numeric_run: int = DEFAULT_MAX_NUMERIC_RUN) -> tuple:
+    """Compact one MD&A section; returns (text, number of sentences removed)"""
+    text = PAGE_ARTIFACT_PATTERN.sub(" ", text)
+    kept = []
+    removed = 0
+    for sentence in SENTENCE_BOUNDARY_PATTERN.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if BOILERPLATE_PATTERN.search(sentence) or (
+                RISK_DISCLAIMER_PATTERN.search(sentence) and not RISK_DRIVER_LIST_PATTERN.search(sentence)):
+            removed += 1
+            continue
+        # Only long sentences are deduplicated; short ones are usually distinct facts
+        if len(sentence) >= min_dedupe_length:
+            fingerprint = _sentence_fingerprint(sentence)
+            if fingerprint in seen:
+                removed += 1
+                continue
+            seen.add(fingerprint)
+        kept.append(_collapse_numeric_runs(sentence, max_numeric_run))
+    return " ".join(kept), removed
+
+def compact_mda_text(text: str, seen: Optional[Set[bytes]] = None,
+                     min_dedupe_length: int = DEFAULT_MIN_DEDUPE_LENGTH,
+                     max_numeric_run: int = DEFAULT_MAX_NUMERIC_RUN) -> CompactionResult:
+    """
+    Shrink MD&A text before it goes into a prompt: drop forward-looking-statement
+    disclaimers and page headers, drop exact repeats (up to whitespace) of long
+    sentences already seen in an earlier file of the same text or in `seen`, and
+    shorten flattened numeric tables. Reworded sentences are not caught, and texts
+    compacted separately (such as the per-filing analyses) are not deduplicated
+    against each other unless they share `seen`. "--- FROM FILE" markers are kept.
+    """
+    seen = seen if seen is not None else set()
+    markers = FILE_MARKER_PATTERN.findall(text)
+    sections = FILE_MARKER_PATTERN.split(text)
+
+    removed = 0
+    parts = []
+    for i, section in enumerate(sections):
+        compacted, section_removed = compact_section(section, seen, min_dedupe_length, max_numeric_run)
+        removed += section_removed
+        parts.append(compacted)
+        if i < len(markers):
+            parts.append(markers[i])
+
+    compacted_text = "".join(parts).strip()
+    return CompactionResult(compacted_text, count_tokens(text), count_tokens(compacted_text), removed)
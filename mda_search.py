@@ -0,0 +1,140 @@
+import re
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, Union
+
+MDA_DIR = Path("edgar_data") / "mda_sections"
+SEARCH_DB_PATH = Path("edgar_data") / "mda_search.sqlite3"
+
+# MD&A files are saved as mda_sections/<identifier>/<form>/MDNA_{fiscal year}_{accession}_{source document}.txt
+MDA_FILENAME_PATTERN = re.compile(r"^MDNA_(\d{4}|unknown_year)_")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sections (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    company TEXT NOT NULL,
+    form TEXT NOT NULL,
+    fiscal_year TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sections_filters ON sections (company, form, fiscal_year);
+CREATE VIRTUAL TABLE IF NOT EXISTS mda_fts USING fts5(body, tokenize = 'porter unicode61');
+"""
+
+def connect(db_path: Union[str, Path] = SEARCH_DB_PATH) -> sqlite3.Connection:
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+def _section_metadata(path: Path, mda_dir: Path) -> tuple:
+    """(company, form, fiscal year) of an MD&A file from its place under mda_dir"""
+    parts = path.relative_to(mda_dir).parts
+    company = parts[0] if len(parts) >= 3 else "unknown"
+    form = parts[1] if len(parts) >= 3 else "unknown"
+    match = MDA_FILENAME_PATTERN.match(path.name)
+    return company, form, match.group(1) if match else "unknown_year"
+
+def update_index(scope: Optional[Union[str, Path]] = None, mda_dir: Union[str, Path] = MDA_DIR,
+                 db_path: Union[str, Path] = SEARCH_DB_PATH) -> dict:
+    """
+    Bring the search index in line with the MD&A files on disk. Only files whose
+    size or mtime changed are (re)read; files that disappeared are dropped. scope
+    limits the scan to one directory under mda_dir (e.g. one company and form).
+    Returns counts of added, updated, removed and unchanged files.
+    """
+    mda_dir = Path(mda_dir)
+    scope = Path(scope) if scope else mda_dir
+    scope_key = str(scope)
+    counts = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            indexed = {
+                row["path"]: row for row in conn.execute(
+                    "SELECT id, path, size, mtime_ns FROM sections WHERE path = ? OR path LIKE ? ESCAPE '\\'",
+                    (scope_key, scope_key.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "/%"),
+                )
+            }
+
+            on_disk = set()
+            for path in sorted(scope.rglob("*.txt")) if scope.exists() else []:
+                key = str(path)
+                on_disk.add(key)
+                stat = path.stat()
+                row = indexed.get(key)
+                if row is not None and row["size"] == stat.st_size and row["mtime_ns"] == stat.st_mtime_ns:
+                    counts["unchanged"] += 1
+                    continue
+
+                body = path.read_text(encoding="utf-8", errors="replace")
+                company, form, fiscal_year = _section_metadata(path, mda_dir)
+                if row is None:
+                    cursor = conn.execute(
+                        "INSERT INTO sections (path, company, form, fiscal_year, size, mtime_ns) VALUES (?, ?, ?, ?, ?, ?)",
+                        (key, company, form, fiscal_year, stat.st_size, stat.st_mtime_ns),
+                    )
+                    conn.execute("INSERT INTO mda_fts (rowid, body) VALUES (?, ?)", (cursor.lastrowid, body))
+                    counts["added"] += 1
+                else:
+                    conn.execute(
+                        "UPDATE sections SET company = ?, form = ?, fiscal_year = ?, size = ?, mtime_ns = ? WHERE id = ?",
+                        (company, form, fiscal_year, stat.st_size, stat.st_mtime_ns, row["id"]),
+                    )
+                    conn.execute("DELETE FROM mda_fts WHERE rowid = ?", (row["id"],))
+                    conn.execute("INSERT INTO mda_fts (rowid, body) VALUES (?, ?)", (row["id"], body))
+                    counts["updated"] += 1
+
+            for key, row in indexed.items():
+                if key not in on_disk:
+                    conn.execute("DELETE FROM mda_fts WHERE rowid = ?", (row["id"],))
+                    conn.execute("DELETE FROM sections WHERE id = ?", (row["id"],))
+                    counts["removed"] += 1
+    finally:
+        conn.close()
+    return counts
+
+def search_mda(query: str, company: Optional[str] = None, form: Optional[str] = None,
+               fiscal_year: Optional[str] = None, limit: int = 20,
+               db_path: Union[str, Path] = SEARCH_DB_PATH) -> List[dict]:
+    """
+    Search indexed MD&A sections, best matches first (BM25). The query uses FTS5
+    syntax: words, "quoted phrases", AND / OR / NOT, NEAR(...) and prefix*.
+    Results can be restricted to a company, form and fiscal year. Each hit has
+    path, company, form, fiscal_year, score (lower is better) and a snippet.
+    """
+    sql = [
+        "SELECT s.path, s.company, s.form, s.fiscal_year, bm25(mda_fts) AS score,",
+        "snippet(mda_fts, 0, '**', '**', ' … ', 16) AS snippet",
+        "FROM mda_fts JOIN sections s ON s.id = mda_fts.rowid",
+        "WHERE mda_fts MATCH ?",
+    ]
+    params = [query]
+    for column, value in (("company", company), ("form", form), ("fiscal_year", fiscal_year)):
+        if value:
+            sql.append(f"AND s.{column} = ?")
+            params.append(str(value))
+    sql.append("ORDER BY score LIMIT ?")
+    params.append(limit)
+
+    conn = connect(db_path)
+    try:
+        return [dict(row) for row in conn.execute(" ".join(sql), params)]
+    except sqlite3.OperationalError as e:
+        raise ValueError(f"Invalid search query {query!r}: {str(e)}")
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    import sys
+
+    print(update_index())
+    if len(sys.argv) > 1:
+        for hit in search_mda(" ".join(sys.argv[1:])):
+            print(f"{hit['score']:8.2f}  {hit['company']} {hit['form']} {hit['fiscal_year']}  {hit['snippet']}")
@@ -0,0 +1,164 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+
+METRICS_DIR = Path("edgar_data") / "metrics"
+METRICS_JSONL_PATH = METRICS_DIR / "metrics.jsonl"
+METRICS_PROM_PATH = METRICS_DIR / "metrics.prom"
+METRIC_PREFIX = "edgar_"
+
+# Upper bounds of histogram buckets; +Inf is implicit
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BYTES_BUCKETS = (1e3, 1e4, 1e5, 1e6, 5e6, 1e7, 5e7, 1e8)
+TOKENS_BUCKETS = (1e2, 1e3, 5e3, 1e4, 2.5e4, 5e4, 1e5, 2.5e5, 1e6)
+
+LabelKey = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+def _key(name: str, labels: dict) -> LabelKey:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class Histogram:
+    """Per-bucket counts (made cumulative on export) plus sum and count"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class MetricsRegistry:
+    """
+    Process-wide counters and histograms with labels. Thread-safe; worker processes
+    send snapshot() back to the parent, which folds them in with merge().
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[LabelKey, float] = {}
+        self._histograms: Dict[LabelKey, Histogram] = {}
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, buckets=SECONDS_BUCKETS, **labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, stage: str, **labels):
+        """Time a block into the stage_seconds histogram, whether or not it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - started, stage=stage, **labels)
+
+    def snapshot(self) -> dict:
+        """Plain, picklable and JSON-serializable copy of every metric"""
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "labels": dict(labels), "value": value}
+                    for (name, labels), value in sorted(self._counters.items())
+                ],
+                "histograms": [
+                    {"name": name, "labels": dict(labels), "buckets": list(h.buckets), "counts": list(h.counts),
+                     "sum": h.sum, "count": h.count}
+                    for (name, labels), h in sorted(self._histograms.items())
+                ],
+            }
+
+    def merge(self, snapshot: dict):
+        """Add a snapshot (e.g. from a worker process) into this registry"""
+        with self._lock:
+            for counter in snapshot.get("counters", []):
+                key = _key(counter["name"], counter["labels"])
+                self._counters[key] = self._counters.get(key, 0) + counter["value"]
+            for item in snapshot.get("histograms", []):
+                key = _key(item["name"], item["labels"])
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(item["buckets"])
+                if histogram.buckets != tuple(item["buckets"]):
+                    continue
+                histogram.counts = [a + b for a, b in zip(histogram.counts, item["counts"])]
+                histogram.sum += item["sum"]
+                histogram.count += item["count"]
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(labels: dict, extra: Optional[dict] = None) -> str:
+    labels = dict(labels, **(extra or {}))
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items()) + "}"
+
+def to_prometheus(snapshot: dict, prefix: str = METRIC_PREFIX) -> str:
+    """Prometheus text exposition format of a snapshot"""
+    lines = []
+    typed = set()
+    for counter in snapshot["counters"]:
+        name = prefix + counter["name"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} counter")
+            typed.add(name)
+        lines.append(f"{name}{_label_text(counter['labels'])} {counter['value']}")
+    for item in snapshot["histograms"]:
+        name = prefix + item["name"]
+        if name not in typed:
+            lines.append(f"# TYPE {name} histogram")
+            typed.add(name)
+        cumulative = 0
+        for bound, count in zip(list(item["buckets"]) + ["+Inf"], item["counts"]):
+            cumulative += count
+            lines.append(f"{name}_bucket{_label_text(item['labels'], {'le': bound})} {cumulative}")
+        lines.append(f"{name}_sum{_label_text(item['labels'])} {item['sum']}")
+        lines.append(f"{name}_count{_label_text(item['labels'])} {item['count']}")
+    return "\n".join(lines) + "\n"
+
+def export_metrics(jsonl_path: Optional[Union[str, Path]] = METRICS_JSONL_PATH,
+                   prom_path: Optional[Union[str, Path]] = METRICS_PROM_PATH, run: Optional[str] = None):
+    """
+    Append the current metrics as one JSON line (with a timestamp and optional run
+    name) and rewrite the Prometheus text file, e.g. for node_exporter's textfile collector.
+    """
+    snapshot = metrics.snapshot()
+    if jsonl_path:
+        jsonl_path = Path(jsonl_path)
+        jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+        record = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "pid": os.getpid(), "run": run, **snapshot}
+        with open(jsonl_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    if prom_path:
+        prom_path = Path(prom_path)
+        prom_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=prom_path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(to_prometheus(snapshot))
+        os.replace(tmp_path, prom_path)
+
+# The registry every module records into
+metrics = MetricsRegistry()
@@ -1,124 +1,221 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
 import requests
+import hashlib
 import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from filing_cache import DEFAULT_CACHE_DIR, DiskCache
+from metrics import BYTES_BUCKETS, metrics
+from xbrl_instance_parser import parse_xbrl_instance
 
-def fetch_xbrl_json(filing_url, api_key):
+XBRL_CONVERTER_API_ENDPOINT = "https://api.sec-api.io/xbrl-to-json"
+XBRL_CACHE_DIR = DEFAULT_CACHE_DIR / "xbrl"
+XBRL_CACHE_MAX_BYTES = 1024 ** 3  # 1 GB of compressed responses
+XBRL_CACHE_TTL = 30 * 24 * 3600  # converted filings do not change; refresh monthly
+
+_session = None
+_xbrl_cache = None
+
+def get_session(pool_size=16, retries=5, backoff_factor=0.5):
     """
-    Fetches XBRL JSON data from SEC API.io for a given filing URL
+    Shared requests session: keep-alive connection pool plus retries with
+    exponential backoff on 429 and 5xx responses (honouring Retry-After).
     """
-    xbrl_converter_api_endpoint = "https://api.sec-api.io/xbrl-to-json"
-    final_url = f"{xbrl_converter_api_endpoint}?htm-url={filing_url}&token={api_key}"
-    
-    response = requests.get(final_url)
+    global _session
+    if _session is None:
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        _session = session
+    return _session
+
+def get_xbrl_cache():
+    """Persistent cache of converted filings under edgar_data/cache/xbrl"""
+    global _xbrl_cache
+    if _xbrl_cache is None:
+        _xbrl_cache = DiskCache(XBRL_CACHE_DIR, XBRL_CACHE_MAX_BYTES, ttl=XBRL_CACHE_TTL)
+    return _xbrl_cache
+
+def fetch_xbrl_json(filing_url, api_key, endpoint=XBRL_CONVERTER_API_ENDPOINT, session=None, cache=None,
+                    use_cache=True, timeout=60):
+    """
+    Fetches XBRL JSON data from SEC API.io for a given filing URL.
+    Responses are cached by filing URL as compressed JSON, so a filing that has
+    already been converted never costs a second API call. Other endpoints (e.g. a
+    local stub) get their own keys, so their responses never stand in for the API's.
+    """
+    cache_key = filing_url if endpoint == XBRL_CONVERTER_API_ENDPOINT else f"{endpoint}|{filing_url}"
+    if use_cache:
+        cache = cache or get_xbrl_cache()
+        cached = cache.get_text(cache_key)
+        metrics.inc("cache_requests_total", cache="xbrl", result="miss" if cached is None else "hit")
+        if cached is not None:
+            return json.loads(cached)
+
+    session = session or get_session()
+    with metrics.timer("xbrl_fetch"):
+        try:
+            response = session.get(endpoint, params={"htm-url": filing_url, "token": api_key}, timeout=timeout)
+        except requests.RequestException as e:
+            metrics.inc("failures_total", stage="xbrl_fetch", reason=type(e).__name__)
+            raise
     if response.status_code != 200:
+        metrics.inc("failures_total", stage="xbrl_fetch", reason=f"http_{response.status_code}")
         raise Exception(f"API request failed with status code {response.status_code}: {response.text}")
-    
-    return json.loads(response.text)
+    metrics.inc("bytes_read_total", len(response.content), stage="xbrl_fetch")
+    metrics.observe("xbrl_response_bytes", len(response.content), buckets=BYTES_BUCKETS)
 
-def save_xbrl_json(xbrl_json, filename="xbrl_data.json"):
+    xbrl_json = response.json()
+    if use_cache:
+        cache.set_text(cache_key, json.dumps(xbrl_json, separators=(",", ":")))
+    return xbrl_json
+
+def fetch_xbrl_json_batch(filing_urls, api_key, max_workers=8, **kwargs):
     """
-    Saves XBRL JSON data to a file
+    Fetches many filings concurrently over the shared connection pool.
+    Returns a dict of filing URL to XBRL JSON, or to the Exception raised for it.
     """
-    with open(filename, "w") as f:
-        json.dump(xbrl_json, f, indent=2)
-    
-    return filename
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(fetch_xbrl_json, url, api_key, **kwargs): url for url in filing_urls}
+        for future in as_completed(futures):
+            url = futures[future]
+            try:
+                results[url] = future.result()
+            except Exception as e:
+                results[url] = e
+    return results
 
-def get_income_statement(xbrl_json):
+def load_xbrl_json(source, api_key=None):
     """
-    Converts XBRL JSON income statement data to a pandas DataFrame
+    Returns XBRL JSON for a filing. A local inline XBRL (.htm/.html) or instance
+    (.xml) file, such as a primary document saved by sec_edgar_downloader, is
+    parsed on disk; anything else is treated as a filing URL for SEC API.io.
+    Local files are placed into statements by concept name, not by the filing's
+    presentation linkbase, so they only show common face-statement line items
+    (see xbrl_instance_parser.classify_concept).
     """
-    income_statement_store = {}
+    if Path(source).suffix.lower() in (".htm", ".html", ".xml") and Path(source).is_file():
+        metrics.inc("bytes_read_total", Path(source).stat().st_size, stage="xbrl_parse")
+        with metrics.timer("xbrl_parse"):
+            return parse_xbrl_instance(source)
+    if not api_key:
+        raise ValueError("An SEC-API.io API key is required to convert a remote filing")
+    return fetch_xbrl_json(source, api_key)
 
-    # iterate over each US GAAP item in the income statement
-    for usGaapItem in xbrl_json['StatementsOfIncome']:
-        values = []
-        indices = []
+def xbrl_filename_for(filing_url):
+    """Per-filing file name for saved XBRL JSON, so concurrent runs do not overwrite each other"""
+    stem = Path(urlparse(filing_url).path).stem or "filing"
+    digest = hashlib.sha1(filing_url.encode("utf-8")).hexdigest()[:10]
+    return f"xbrl_{stem}_{digest}.json"
 
-        for fact in xbrl_json['StatementsOfIncome'][usGaapItem]:
-            # only consider items without segment
-            if 'segment' not in fact:
-                index = fact['period']['startDate'] + '-' + fact['period']['endDate']
-                # ensure no index duplicates are created
-                if index not in indices:
-                    values.append(fact['value'])
-                    indices.append(index)                    
+def save_xbrl_json(xbrl_json, filename="xbrl_data.json"):
+    """
+    Saves XBRL JSON data to a file as compact JSON. The file is written to a
+    temporary name and renamed into place, so readers never see a partial file.
+    """
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(xbrl_json, f, separators=(",", ":"))
+        os.replace(tmp_path, filename)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    
+    return filename
 
-        income_statement_store[usGaapItem] = pd.Series(values, index=indices) 
+def _period_label(period):
+    """Column label for a fact period: the instant, or "startDate-endDate" for a duration"""
+    if "instant" in period:
+        return period["instant"]
+    return period["startDate"] + "-" + period["endDate"]
 
-    income_statement = pd.DataFrame(income_statement_store)
-    # switch columns and rows so that US GAAP items are rows and each column header represents a date range
-    return income_statement.T 
+def _segment_label(segment):
+    """Readable label for a fact's segment (one dimension member or a list of them)"""
+    members = segment if isinstance(segment, list) else [segment]
+    return "; ".join(f"{m.get('dimension', '')}={m.get('value', '')}" for m in members)
 
-def get_balance_sheet(xbrl_json):
+def build_statement_frame(xbrl_json, statement_key, include_segments=False):
     """
-    Converts XBRL JSON balance sheet data to a pandas DataFrame
+    Converts one XBRL JSON statement (e.g. "StatementsOfIncome") to a pandas DataFrame
+    with US GAAP items as rows and periods as columns.
+    All facts are flattened into one record list in a single pass, duplicates
+    (same item, segment and period) keep their first value, and the wide table
+    comes from one pivot. Facts without a value count as 0. Segment facts are
+    dropped unless include_segments is True, in which case rows are indexed by
+    (item, segment) with an empty segment for the consolidated value.
     """
-    balance_sheet_store = {}
+    with metrics.timer("xbrl_frame", statement=statement_key):
+        return _build_statement_frame(xbrl_json.get(statement_key, {}), include_segments)
 
-    for usGaapItem in xbrl_json['BalanceSheets']:
-        values = []
-        indices = []
+def _build_statement_frame(statement, include_segments):
+    records = [
+        (
+            usGaapItem,
+            _segment_label(fact["segment"]) if "segment" in fact else "",
+            _period_label(fact["period"]),
+            fact.get("value", 0),
+        )
+        for usGaapItem, facts in statement.items()
+        for fact in facts
+        if include_segments or "segment" not in fact
+    ]
+    if not records:
+        return pd.DataFrame(index=list(statement) if not include_segments else None)
 
-        for fact in xbrl_json['BalanceSheets'][usGaapItem]:
-            # only consider items without segment
-            if 'segment' not in fact:
-                index = fact['period']['instant']
-
-                # avoid duplicate indices with same values
-                if index in indices:
-                    continue
-                    
-                # add 0 if value is nil
-                if "value" not in fact:
-                    values.append(0)
-                else:
-                    values.append(fact['value'])
+    facts = pd.DataFrame.from_records(records, columns=["item", "segment", "period", "value"])
+    facts = facts.drop_duplicates(subset=["item", "segment", "period"], keep="first")
 
-                indices.append(index)                    
+    if include_segments:
+        wide = facts.pivot(index=["item", "segment"], columns="period", values="value")
+        # keep items in filing order, segments in first-seen order within each item
+        order = pd.MultiIndex.from_frame(facts[["item", "segment"]].drop_duplicates())
+        wide = wide.reindex(order)
+    else:
+        wide = facts.pivot(index="item", columns="period", values="value")
+        # items that only have segment facts still get an (empty) row, as before
+        wide = wide.reindex(list(statement))
+        wide.index.name = None
+    # pivot sorts the periods; keep them in the order the filing lists them
+    wide = wide.reindex(columns=facts["period"].unique())
+    wide.columns.name = None
+    return wide
 
-        balance_sheet_store[usGaapItem] = pd.Series(values, index=indices) 
+def get_income_statement(xbrl_json, include_segments=False):
+    """
+    Converts XBRL JSON income statement data to a pandas DataFrame
+    """
+    return build_statement_frame(xbrl_json, "StatementsOfIncome", include_segments)
 
-    balance_sheet = pd.DataFrame(balance_sheet_store)
-    # switch columns and rows so that US GAAP items are rows and each column header represents a date instant
-    return balance_sheet.T
+def get_balance_sheet(xbrl_json, include_segments=False):
+    """
+    Converts XBRL JSON balance sheet data to a pandas DataFrame
+    """
+    return build_statement_frame(xbrl_json, "BalanceSheets", include_segments)
 
-def get_cash_flow_statement(xbrl_json):
+def get_cash_flow_statement(xbrl_json, include_segments=False):
     """
     Converts XBRL JSON cash flow statement data to a pandas DataFrame
     """
-    cash_flows_store = {}
-
-    for usGaapItem in xbrl_json['StatementsOfCashFlows']:
-        values = []
-        indices = []
-
-        for fact in xbrl_json['StatementsOfCashFlows'][usGaapItem]:        
-            # only consider items without segment
-            if 'segment' not in fact:
-                # check if date instant or date range is present
-                if "instant" in fact['period']:
-                    index = fact['period']['instant']
-                else:
-                    index = fact['period']['startDate'] + '-' + fact['period']['endDate']
-
-                # avoid duplicate indices with same values
-                if index in indices:
-                    continue
-
-                if "value" not in fact:
-                    values.append(0)
-                else:
-                    values.append(fact['value'])
-
-                indices.append(index)                    
-
-        cash_flows_store[usGaapItem] = pd.Series(values, index=indices) 
-
-    cash_flows = pd.DataFrame(cash_flows_store)
-    return cash_flows.T
+    return build_statement_frame(xbrl_json, "StatementsOfCashFlows", include_segments)
 
 
 # Update the main app to include tab6
@@ -129,20 +226,20 @@ def add_tab6():
         
         This tab allows you to process SEC filings in XBRL format directly from the SEC website. The tool:
         
-        1. Takes any SEC filing URL (10-K, 10-Q, etc.)
-        2. Converts the XBRL data to structured JSON 
+        1. Takes any SEC filing URL (10-K, 10-Q, etc.) or a downloaded inline XBRL file
+        2. Converts the XBRL data to structured JSON (locally for downloaded files)
         3. Extracts Income Statement, Balance Sheet, and Cash Flow Statement
         4. Displays the financial data and visualizations
         
-        You'll need an API key from SEC-API.io to use this functionality.
+        You'll need an API key from SEC-API.io to convert remote filings.
         """)
     
     st.header("🧮 SEC XBRL Financial Data Processor")
     
     filing_url = st.text_input(
-        "Enter SEC Filing URL", 
+        "Enter SEC Filing URL or local file path", 
         value="https://www.sec.gov/Archives/edgar/data/320193/000032019324000123/aapl-20240928.html",
-        help="URL of the SEC filing HTML document (10-K, 10-Q, etc.)"
+        help="URL of the SEC filing HTML document (10-K, 10-Q, etc.), or the path of a downloaded inline XBRL/instance file (no API key needed; its statements are approximated from common line items by concept name)"
     )
     
     api_key = st.text_input(
@@ -152,16 +249,17 @@ def add_tab6():
     )
     
     if st.button("Process XBRL Filing", key="process_xbrl"):
-        if not filing_url or not api_key:
+        is_local = Path(filing_url).is_file()
+        if not filing_url or (not api_key and not is_local):
             st.warning("⚠️ Please enter both a filing URL and an API key.")
         else:
             try:
                 with st.spinner("Fetching and processing XBRL data..."):
-                    # Fetch XBRL JSON data
-                    xbrl_json = fetch_xbrl_json(filing_url, api_key)
+                    # Parse a local instance file, or fetch XBRL JSON data from the API
+                    xbrl_json = load_xbrl_json(filing_url, api_key)
                     
                     # Save to file (optional)
-                    filename = save_xbrl_json(xbrl_json)
+                    filename = save_xbrl_json(xbrl_json, xbrl_filename_for(filing_url))
                     st.success(f"✅ Successfully fetched XBRL data and saved to {filename}")
                     
                     # Extract financial statements
@@ -0,0 +1,127 @@
+import json
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from html_stream import iter_file_chunks, normalize_text, stream_html_text
+
+INDEX_VERSION = 3
+
+# "Item 1A.", "ITEM 7.", "Item 9B." at the start of a text node
+ITEM_HEADING_PATTERN = re.compile(r"Item\s+(\d{1,2}[A-C]?)\.", re.IGNORECASE)
+
+# Table-of-contents rows: at least TOC_MIN_RUN headings in a row, each running
+# into the next one within TOC_ENTRY_MAX_LENGTH characters (title and page number)
+TOC_ENTRY_MAX_LENGTH = 200
+TOC_MIN_RUN = 3
+
+def _toc_entries(spans: List[tuple]) -> List[bool]:
+    """For each (item, start, end) span, whether it sits in a table-of-contents run"""
+    in_toc = [False] * len(spans)
+    i = 0
+    while i < len(spans):
+        j = i
+        while j < len(spans) and spans[j][2] - spans[j][1] < TOC_ENTRY_MAX_LENGTH:
+            j += 1
+        if j - i >= TOC_MIN_RUN:
+            in_toc[i:j] = [True] * (j - i)
+        i = max(j, i + 1)
+    return in_toc
+
+def select_sections(headings: List[tuple], text_length: int) -> List[list]:
+    """
+    Sorted [item, start, end] sections from (item, offset) headings. Headings in a
+    table-of-contents run only count for items that appear more than once with
+    no other occurrence, and then the last one wins: a run of short body items
+    (e.g. Items 3 and 4) follows the table of contents.
+    Otherwise the longest span of an item is kept (Part I/Part II of a 10-Q),
+    however short, so brief items such as a one-line Item 7A are not lost.
+    """
+    spans = [
+        (item, start, headings[i + 1][1] if i + 1 < len(headings) else text_length)
+        for i, (item, start) in enumerate(headings)
+    ]
+    occurrences = Counter(item for item, _ in headings)
+    chosen: Dict[str, tuple] = {}
+    for (item, start, end), toc in zip(spans, _toc_entries(spans)):
+        if toc and occurrences[item] == 1:
+            continue
+        rank = (False, start) if toc else (True, end - start)
+        if item not in chosen or rank > chosen[item][0]:
+            chosen[item] = (rank, start, end)
+    return sorted(([item, start, end] for item, (_, start, end) in chosen.items()), key=lambda s: s[1])
+
+class SectionRecorder:
+    """
+    stream_html_text callback that normalizes each text node and keeps the offset
+    of every Item heading in the normalized text, so one parse feeds both the text
+    cache and the section index. " ".join of the pieces equals
+    normalize_text(" ".join(nodes)): whitespace-only nodes vanish and every other
+    node is normalized on its own. Only headings that start a text node count, so
+    inline cross references ("see Item 1A.") do not split sections.
+    """
+
+    def __init__(self):
+        self.pieces: List[str] = []
+        self.headings: List[tuple] = []
+        self._length = 0
+
+    def __call__(self, text: str):
+        if not text.replace("\xa0", " ").strip():
+            return
+        if self.pieces:
+            self._length += 1  # joining space
+        text = normalize_text(text)
+        match = ITEM_HEADING_PATTERN.match(text)
+        if match:
+            self.headings.append((match.group(1).upper(), self._length))
+        self.pieces.append(text)
+        self._length += len(text)
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.pieces)
+
+    def sections(self) -> List[list]:
+        return select_sections(self.headings, self._length)
+
+def sections_cache_key(text_key: str) -> str:
+    """Text-cache key of the section offsets for the document whose text is under text_key"""
+    return f"sections:v{INDEX_VERSION}:{text_key}"
+
+def get_section_index(html_path: Union[str, Path], cache=None) -> dict:
+    """
+    Sorted [item, start, end] offsets into the filing's cached plain text, stored
+    next to that text in the text cache and built by the same parse.
+    """
+    # filing_cache imports this module for SectionRecorder
+    from filing_cache import file_sha256, get_filing_text, get_text_cache
+
+    cache = cache or get_text_cache()
+    key = sections_cache_key(file_sha256(html_path))
+    stored = cache.get_text(key)
+    if stored is None:
+        get_filing_text(html_path, cache)  # a text miss records the offsets too
+        stored = cache.get_text(key)
+    if stored is None:  # text cached before its offsets were
+        recorder = SectionRecorder()
+        stream_html_text(iter_file_chunks(html_path), recorder)
+        stored = json.dumps(recorder.sections(), separators=(",", ":"))
+        cache.set_text(key, stored)
+    return {"version": INDEX_VERSION, "source": str(html_path), "sections": json.loads(stored)}
+
+def get_section(html_path: Union[str, Path], item: str, cache=None) -> Optional[str]:
+    """Slice one item (e.g. "1A", "7", "7A", "8") out of the cached text of a filing without re-parsing"""
+    # filing_cache imports this module for SectionRecorder
+    from filing_cache import get_filing_text
+
+    item = item.upper()
+    for name, start, end in get_section_index(html_path, cache)["sections"]:
+        if name == item:
+            return get_filing_text(html_path, cache)[start:end].strip()
+    return None
+
+def list_sections(index: dict) -> List[str]:
+    """Items found in a filing, in document order"""
+    return [name for name, _, _ in index["sections"]]
@@ -0,0 +1,221 @@
+import re
+import xml.etree.ElementTree as ET
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+XBRLI_NS = "http://www.xbrl.org/2003/instance"
+XBRLDI_NS = "http://xbrl.org/2006/xbrldi"
+IX_NS = "http://www.xbrl.org/2013/inlineXBRL"
+XSI_NIL = "{http://www.w3.org/2001/XMLSchema-instance}nil"
+
+# Namespaces whose elements are never financial facts
+NON_FACT_NAMESPACES = {
+    XBRLI_NS,
+    XBRLDI_NS,
+    IX_NS,
+    "http://www.xbrl.org/2003/linkbase",
+    "http://www.w3.org/1999/xlink",
+    "http://www.w3.org/1999/xhtml",
+}
+# Concept prefixes/namespaces that describe the document rather than the financials
+DOCUMENT_CONCEPT_PATTERN = re.compile(r"(^|/)dei(/|$)|^dei:")
+
+# Statement membership by concept name. The presentation linkbase is not parsed,
+# so this is an approximation: only a curated set of common us-gaap face-statement
+# concepts (matched as prefixes of the local name) is placed, and facts that only
+# appear in notes or schedules are left out, as are company-specific extension
+# concepts. Concepts that lead one statement into another (net income, ending
+# cash) are placed in both.
+CASH_FLOW_PATTERN = re.compile(
+    r"^(NetCashProvidedByUsedIn|PaymentsFor|PaymentsOf|PaymentsTo|ProceedsFrom|RepaymentsOf|"
+    r"IncreaseDecreaseIn|CashCashEquivalents|CashAndCashEquivalents|DepreciationDepletionAndAmortization|"
+    r"DepreciationAndAmortization|Depreciation|ShareBasedCompensation|AllocatedShareBasedCompensation|"
+    r"DeferredIncomeTax|IncomeTaxesPaid|InterestPaid|OtherNoncash|EffectOfExchangeRate|"
+    r"ProfitLoss$|NetIncomeLoss$)"
+)
+INCOME_PATTERN = re.compile(
+    r"^(Revenues$|RevenueFromContractWithCustomer|SalesRevenueNet$|CostOfRevenue$|CostOfGoodsAndServicesSold$|"
+    r"CostOfGoodsSold$|CostOfServices$|CostsAndExpenses$|GrossProfit$|OperatingExpenses$|OperatingCostsAndExpenses$|"
+    r"OperatingIncomeLoss$|ResearchAndDevelopmentExpense|SellingGeneralAndAdministrativeExpense$|"
+    r"GeneralAndAdministrativeExpense$|SellingAndMarketingExpense$|MarketingAndAdvertisingExpense$|"
+    r"RestructuringCharges$|AssetImpairmentCharges$|GoodwillImpairmentLoss$|NonoperatingIncomeExpense$|"
+    r"OtherNonoperatingIncomeExpense$|InterestExpense$|InterestExpenseNonoperating$|InterestIncomeExpenseNet$|"
+    r"InterestIncomeExpenseNonoperatingNet$|InvestmentIncomeInterest$|InvestmentIncomeInterestAndDividend$|"
+    r"IncomeLossFromContinuingOperations|IncomeTaxExpenseBenefit$|IncomeLossFromDiscontinuedOperations|"
+    r"NetIncomeLoss|ProfitLoss$|EarningsPerShareBasic|EarningsPerShareDiluted$|"
+    r"WeightedAverageNumberOfSharesOutstandingBasic|WeightedAverageNumberOfDilutedSharesOutstanding$|"
+    r"ComprehensiveIncomeNetOfTax)"
+)
+BALANCE_PATTERN = re.compile(
+    r"^(Assets$|AssetsCurrent$|AssetsNoncurrent$|Liabilities$|LiabilitiesCurrent$|LiabilitiesNoncurrent$|"
+    r"LiabilitiesAndStockholdersEquity$|StockholdersEquity|CashAndCashEquivalentsAtCarryingValue$|Cash$|"
+    r"CashCashEquivalentsRestrictedCashAndRestrictedCashEquivalents$|RestrictedCash|ShortTermInvestments$|"
+    r"MarketableSecurities|AvailableForSaleSecurities|AccountsReceivable|NontradeReceivables|InventoryNet$|"
+    r"PrepaidExpense|OtherAssets|PropertyPlantAndEquipmentNet$|OperatingLeaseRightOfUseAsset$|Goodwill$|"
+    r"IntangibleAssetsNet|FiniteLivedIntangibleAssetsNet$|DeferredIncomeTaxAssetsNet$|DeferredTaxAssetsNet|"
+    r"AccountsPayable|AccruedLiabilities|EmployeeRelatedLiabilitiesCurrent$|ContractWithCustomerLiability|"
+    r"DeferredRevenue|CommercialPaper$|ShortTermBorrowings$|LongTermDebt|DebtCurrent$|"
+    r"OperatingLeaseLiability|FinanceLeaseLiability|DeferredIncomeTaxLiabilities|OtherLiabilities|"
+    r"AccruedIncomeTaxes|CommitmentsAndContingencies$|CommonStock|PreferredStockValue|AdditionalPaidInCapital|"
+    r"TreasuryStockValue|RetainedEarningsAccumulatedDeficit$|AccumulatedOtherComprehensiveIncomeLossNetOfTax$|"
+    r"MinorityInterest$)"
+)
+CASH_BALANCE_PATTERN = re.compile(r"^(CashCashEquivalents|CashAndCashEquivalents)")
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+def _namespace(tag: str) -> str:
+    return tag[1:].split("}", 1)[0] if tag.startswith("{") else ""
+
+def _format_number(value: Decimal) -> str:
+    """Render like the sec-api.io JSON: integers without exponent or trailing zeros"""
+    if value == value.to_integral_value():
+        return str(int(value))
+    return format(value.normalize(), "f")
+
+def _inline_value(elem: ET.Element) -> Optional[str]:
+    """Numeric value of an ix:nonFraction, applying its format, scale and sign"""
+    if elem.get(XSI_NIL) == "true":
+        return None
+    text = "".join(elem.itertext()).strip()
+    fmt = (elem.get("format") or "").lower()
+    if "zero" in fmt or text in ("", "-", "—", "–"):
+        number = Decimal(0)
+    else:
+        if "numcommadecimal" in fmt.replace("-", ""):
+            # ixt:num-comma-decimal: "1.234,5"
+            text = text.replace(".", "").replace(" ", "").replace(",", ".")
+        else:
+            text = text.replace(",", "").replace(" ", "")
+        try:
+            number = Decimal(text)
+        except InvalidOperation:
+            return None
+    scale = elem.get("scale")
+    if scale:
+        number = number.scaleb(int(scale))
+    if elem.get("sign") == "-":
+        number = -number
+    return _format_number(number)
+
+def _read_context(elem: ET.Element) -> dict:
+    """Period and dimension members of an xbrli:context"""
+    period = {}
+    instant = elem.find(f".//{{{XBRLI_NS}}}instant")
+    if instant is not None:
+        period["instant"] = instant.text.strip()
+    else:
+        start = elem.find(f".//{{{XBRLI_NS}}}startDate")
+        end = elem.find(f".//{{{XBRLI_NS}}}endDate")
+        if start is not None and end is not None:
+            period["startDate"] = start.text.strip()
+            period["endDate"] = end.text.strip()
+
+    members = [
+        {"dimension": member.get("dimension"), "value": (member.text or "").strip()}
+        for member in elem.iter(f"{{{XBRLDI_NS}}}explicitMember")
+    ]
+    members.extend(
+        {"dimension": member.get("dimension"), "value": "".join(member.itertext()).strip()}
+        for member in elem.iter(f"{{{XBRLDI_NS}}}typedMember")
+    )
+    return {"period": period, "segment": members}
+
+# Elements whose subtree is read when they close, so their children must survive until then
+_READ_WHOLE_TAGS = {f"{{{XBRLI_NS}}}context", f"{{{IX_NS}}}nonFraction"}
+
+def iter_instance_facts(path: Union[str, Path], contexts: Dict[str, dict]):
+    """
+    Stream (concept, context_id, fact) tuples from an inline XBRL (.htm/.html) or
+    XBRL instance (.xml) document with iterparse, filling `contexts` with every
+    xbrli:context seen (id -> period and dimension members). Each element is
+    removed from its parent once read, so memory stays bounded by the document
+    depth rather than its size.
+    """
+    stack: List[ET.Element] = []
+    open_whole = 0  # number of open elements listed in _READ_WHOLE_TAGS
+    is_instance_root = None
+
+    for event, elem in ET.iterparse(str(path), events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if is_instance_root is None:
+                is_instance_root = tag == f"{{{XBRLI_NS}}}xbrl"
+            if tag in _READ_WHOLE_TAGS:
+                open_whole += 1
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        if tag in _READ_WHOLE_TAGS:
+            open_whole -= 1
+        if tag == f"{{{XBRLI_NS}}}context":
+            contexts[elem.get("id")] = _read_context(elem)
+        elif tag == f"{{{IX_NS}}}nonFraction":
+            concept = elem.get("name", "")
+            if not DOCUMENT_CONCEPT_PATTERN.search(concept):
+                fact = {"decimals": elem.get("decimals"), "unitRef": elem.get("unitRef")}
+                value = _inline_value(elem)
+                if value is not None:
+                    fact["value"] = value
+                yield concept.split(":", 1)[-1], elem.get("contextRef"), fact
+        elif (is_instance_root and len(stack) == 1 and elem.get("contextRef")
+              and _namespace(tag) not in NON_FACT_NAMESPACES
+              and not DOCUMENT_CONCEPT_PATTERN.search(_namespace(tag))):
+            fact = {"decimals": elem.get("decimals"), "unitRef": elem.get("unitRef")}
+            if elem.get(XSI_NIL) != "true" and elem.text is not None:
+                fact["value"] = elem.text.strip()
+            # Only numeric facts carry units
+            if fact["unitRef"] is not None:
+                yield _local_name(tag), elem.get("contextRef"), fact
+
+        if open_whole:
+            continue
+        # A completed child is always the last child of its parent
+        if stack and len(stack[-1]) and stack[-1][-1] is elem:
+            del stack[-1][-1]
+        else:
+            elem.clear()
+
+def classify_concept(concept: str, period: dict) -> List[str]:
+    """Statements (sec-api.io JSON keys) a concept belongs to, inferred from its name and period type (an approximation, see the patterns above)"""
+    statements = []
+    if "instant" in period:
+        if BALANCE_PATTERN.match(concept):
+            statements.append("BalanceSheets")
+        if CASH_BALANCE_PATTERN.match(concept):
+            statements.append("StatementsOfCashFlows")
+        return statements
+    if INCOME_PATTERN.search(concept):
+        statements.append("StatementsOfIncome")
+    if CASH_FLOW_PATTERN.match(concept):
+        statements.append("StatementsOfCashFlows")
+    return statements
+
+def parse_xbrl_instance(path: Union[str, Path]) -> dict:
+    """
+    Parse a local inline XBRL or XBRL instance file into the same
+    StatementsOfIncome / BalanceSheets / StatementsOfCashFlows JSON shape the
+    sec-api.io xbrl-to-json endpoint returns, so get_income_statement and friends
+    work on it unchanged.
+    """
+    # Contexts may follow the facts that use them, so facts are resolved at the end
+    contexts: Dict[str, dict] = {}
+    try:
+        facts = list(iter_instance_facts(path, contexts))
+    except ET.ParseError as e:
+        raise ValueError(f"{path} is not a well-formed XBRL instance: {str(e)}")
+
+    xbrl_json = {"StatementsOfIncome": {}, "BalanceSheets": {}, "StatementsOfCashFlows": {}}
+    for concept, context_id, fact in facts:
+        context = contexts.get(context_id)
+        if not context or not context["period"]:
+            continue
+        fact = dict(fact, period=context["period"])
+        if context["segment"]:
+            fact["segment"] = context["segment"][0] if len(context["segment"]) == 1 else context["segment"]
+        for statement in classify_concept(concept, context["period"]):
+            xbrl_json[statement].setdefault(concept, []).append(fact)
+    return xbrl_json